@@ -12,9 +12,10 @@ from tkinter import PhotoImage
 import tkinter
 
 from leer_constantes import abrir_archivo_xml, leer_ancho_pagina
-from leer_constantes import leer_logos
+from leer_constantes import leer_logos, leer_modo_edicion
 from leer_datos_conexion import abrir_xml_conexion, leer_conexion
 from modelo.base_datos import Conexion
+from modelo.refresco import Refresco
 from vista.tabla_equipos import TablaEquipos
 from vista.ventana_inicio import crear_ventana_inicio
 
@@ -65,6 +66,7 @@ def cerrar_aplicacion(__=None):
     if not tkinter.messagebox.askokcancel(
             "Cerrar aplicación", "¿Quiere cerrar la aplicación?"):
         return
+    refresco.finalizar()
     ventana_principal.destroy()
 
 
@@ -74,8 +76,28 @@ def temporizador_refrescar():
 
     """
     ventana_principal.after(10000, temporizador_refrescar)
-    tabla_equipos.refrescar_tabla()
-    estadisticas.config(text=conexion.resumen_equipos())
+    # Las consultas se realizan en el hilo de refresco, para no bloquear la
+    # interfaz mientras la base de datos responde.
+    refresco.solicitar()
+
+
+def atender_refresco():
+    """
+    Recoge los resultados del hilo de refresco y los muestra en la ventana.
+
+    """
+    ventana_principal.after(100, atender_refresco)
+    for resultado in refresco.resultados():
+        if "error" in resultado:
+            raise resultado["error"]
+        tabla_equipos.refrescar_tabla_datos(resultado)
+        # Las estadísticas se calculan a partir de la tabla. Si la consulta de
+        # comprobación no coincide, pedimos un refresco completo de la tabla.
+        resumen = tabla_equipos.resumen
+        if resultado["resumen"] is not None and \
+                resultado["resumen"] != resumen:
+            refresco.solicitar(completo=True)
+        estadisticas.config(text=Conexion.texto_resumen(resumen))
 
 
 ################################################################################
@@ -96,16 +118,19 @@ except Exception as error:
 ################################################################################
 # Realizar conexión con la base de datos y ventana de inicio
 ################################################################################
-conexion = leer_conexion()
+datos_conexion = leer_conexion()
+modo_edicion = leer_modo_edicion()
 tiempo_inicio = time.time()
 ventana_inicio, tiempo = crear_ventana_inicio()
 try:
     conexion = Conexion(
-        conexion["USER"],
-        conexion["PASS"],
-        conexion["HOST"],
-        conexion["BASE"],
-        conexion["TIME"])
+        datos_conexion["USER"],
+        datos_conexion["PASS"],
+        datos_conexion["HOST"],
+        datos_conexion["BASE"],
+        datos_conexion["TIME"],
+        modo_edicion["DIFERIDA"],
+        modo_edicion["BLOQUEO"])
 except ValueError as error:
     ventana_inicio.destroy()
     tkinter.messagebox.showerror(
@@ -187,7 +212,7 @@ barra_estado.grid(row=2, column=0, columnspan=2, sticky="ews")
 # Y las etiquetas dentro de la barra de estado para mostrar la información.
 tkinter.Label(barra_estado, text=conexion).pack(
     side=tkinter.LEFT, padx=10)
-estadisticas = tkinter.Label(barra_estado, text=conexion.resumen_equipos())
+estadisticas = tkinter.Label(barra_estado)
 estadisticas.pack(side=tkinter.RIGHT, padx=10)
 
 ################################################################################
@@ -195,6 +220,7 @@ estadisticas.pack(side=tkinter.RIGHT, padx=10)
 ################################################################################
 # Crear objeto donde se colocará la tabla de equipos.
 tabla_equipos = TablaEquipos(ventana_principal, tabla, conexion, puntos, fondo)
+estadisticas.config(text=Conexion.texto_resumen(tabla_equipos.resumen))
 
 ancho_pagina = leer_ancho_pagina()
 
@@ -213,8 +239,13 @@ ventana_principal.rowconfigure(1, weight=1)
 # Tecla Escape para salir de la aplicación
 ventana_principal.bind("<Escape>", cerrar_aplicacion)
 ventana_principal.protocol("WM_DELETE_WINDOW", cerrar_aplicacion)
-# Activamos el temporizador.
+# Activamos el hilo de refresco (que comparte la reserva de conexiones de
+# lectura con la interfaz), el temporizador que le solicita los datos, y
+# el que recoge sus resultados.
+refresco = Refresco(conexion)
+refresco.start()
 temporizador_refrescar()
+atender_refresco()
 
 try:
     ventana_principal.mainloop()
@@ -166,6 +166,28 @@ def leer_margen_pagina():
     return int(elemento.attrib["MARGENX"]), int(elemento.attrib["MARGENY"])
 
 
+@captura_error
+def leer_modo_edicion():
+    raiz = archivo_xml.getroot()
+    elemento = raiz.find("edicion")
+    bloqueo = elemento.attrib["BLOQUEO"]
+    if bloqueo not in ("equipo", "zona", "optimista"):
+        raise KeyError(bloqueo)
+    return {
+        "DIFERIDA": int(elemento.attrib["DIFERIDA"]) != 0,
+        "BLOQUEO": bloqueo}
+
+
+@captura_error
+def leer_modo_tabla():
+    raiz = archivo_xml.getroot()
+    elemento = raiz.find("tabla")
+    modo = elemento.attrib["MODO"]
+    if modo not in ("completa", "virtual", "arbol"):
+        raise KeyError(modo)
+    return modo
+
+
 @captura_error
 def leer_alturas_tabla():
     raiz = archivo_xml.getroot()
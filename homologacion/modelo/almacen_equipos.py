@@ -0,0 +1,207 @@
+'''
+Created on 18 oct 2026
+
+Almacén en memoria con la lista completa de equipos, tal y como la devuelve la
+vista Homologacion_ListaEquipos.
+
+El almacén permite obtener los datos de la tabla de equipos para cualquier
+combinación de filtro de estado, criterio de ordenación y categorías sin
+realizar ninguna consulta a la base de datos. Para ello, guarda:
+- Las claves de ordenación de cada equipo, calculadas una única vez al añadir
+  o actualizar el equipo. Los textos se ordenan según el alfabeto español, sin
+  distinguir mayúsculas ni acentos (la ñ se ordena entre la n y la o).
+- Un índice por estado (ver variable ESTADO) y otro por categoría, con los
+  dorsales de los equipos que cumplen cada uno de ellos.
+- La lista de dorsales ordenada para cada criterio de ordenación, que sólo se
+  recalcula cuando cambia alguna clave de ordenación.
+
+Los índices por estado permiten además obtener las estadísticas de la barra de
+estado sin consultar la vista de resumen de la base de datos.
+'''
+
+import unicodedata
+
+from modelo.base_datos import ESTADO, ORDEN_TABLA, estado
+
+
+def clave_texto(texto):
+    """
+    Devuelve la clave de ordenación de un texto en español.
+
+    La clave no distingue entre mayúsculas y minúsculas, ni tiene en cuenta
+    los acentos, salvo la ñ, que se ordena después de la n.
+
+    """
+    if texto is None:
+        return ""
+    texto = unicodedata.normalize("NFC", str(texto)).casefold()
+    # Sustituimos la ñ por una n seguida del mayor carácter posible, para que
+    # se ordene después de cualquier otra combinación de la n.
+    texto = texto.replace("ñ", "n\uffff")
+    # Y eliminamos el resto de acentos y diéresis.
+    return "".join(c for c in unicodedata.normalize("NFD", texto)
+                   if not unicodedata.combining(c))
+
+
+class AlmacenEquipos(object):
+
+    def __init__(self, campos):
+        """
+        Argumentos:
+        - campos: nombres de los campos de la vista Homologacion_ListaEquipos,
+          en el mismo orden en el que aparecen en los registros.
+
+        """
+        # Posición de cada uno de los campos necesarios dentro del registro.
+        self.__dorsal = campos.index("FK_EQUIPO")
+        self.__nombre = campos.index("equipo")
+        self.__categoria = campos.index("FK_COMPETICION")
+        self.__registrado = campos.index("registrado")
+        self.__homologado = campos.index("homologado")
+        self.__orden = {
+            orden: campos.index(campo) for orden, campo in ORDEN_TABLA.items()}
+
+        # Registros de los equipos, indexados por dorsal.
+        self.__equipos = {}
+        # Claves de ordenación de cada equipo, indexadas por dorsal, y para
+        # cada dorsal, por criterio de ordenación.
+        self.__claves = {}
+        # Índices de dorsales por estado y por categoría.
+        self.__por_estado = {filtro: set() for filtro in ESTADO}
+        self.__por_categoria = {}
+        # Listas de dorsales ordenadas por cada criterio. Si para un criterio
+        # no existe la lista, se calcula la próxima vez que se necesite.
+        self.__ordenados = {}
+        # Índice de las filas de la última tabla generada (ver función
+        # equipo).
+        self.__filas = {}
+
+    def cargar(self, lista):
+        """
+        Sustituye el contenido del almacén por la lista de equipos indicada.
+
+        """
+        self.__equipos = {}
+        self.__claves = {}
+        self.__por_estado = {filtro: set() for filtro in ESTADO}
+        self.__por_categoria = {}
+        self.__ordenados = {}
+        self.actualizar(lista)
+
+    def actualizar(self, lista):
+        """
+        Añade o actualiza los equipos de la lista, sin modificar el resto.
+
+        """
+        for registro in lista:
+            registro = tuple(registro)
+            dorsal = registro[self.__dorsal]
+            anterior = self.__equipos.get(dorsal)
+            if anterior is not None:
+                self.__quitar_indices(dorsal, anterior)
+            self.__equipos[dorsal] = registro
+
+            # Claves de ordenación. Sólo invalidamos las listas ordenadas si
+            # la clave ha cambiado (lo habitual es que sólo cambien los
+            # valores de las zonas o el estado del equipo).
+            claves = {}
+            for orden, columna in self.__orden.items():
+                valor = registro[columna]
+                if valor is None or isinstance(valor, str):
+                    valor = clave_texto(valor)
+                claves[orden] = (valor, dorsal)
+            if claves != self.__claves.get(dorsal):
+                self.__claves[dorsal] = claves
+                self.__ordenados = {}
+
+            # Índices por estado y por categoría.
+            registrado = registro[self.__registrado]
+            homologado = registro[self.__homologado]
+            for filtro, (lista_reg, lista_hom) in ESTADO.items():
+                if registrado in lista_reg and homologado in lista_hom:
+                    self.__por_estado[filtro].add(dorsal)
+            self.__por_categoria.setdefault(
+                registro[self.__categoria], set()).add(dorsal)
+
+    def tabla(self, filtro, orden, categorias):
+        """
+        Devuelve los datos de la tabla de equipos en el formato requerido por
+        la clase Tabla: un diccionario cuya clave es el número de fila, y su
+        valor el registro del equipo.
+
+        El número de fila se calcula sobre la lista de equipos de las
+        categorías seleccionadas, antes de aplicar el filtro de estado, por
+        lo que un equipo ocupa siempre la misma fila, independientemente del
+        filtro de estado seleccionado.
+
+        Argumentos:
+        - filtro: filtro de estado (ver tipo enumerado estado).
+        - orden: criterio de ordenación (ver variable ORDEN_TABLA).
+        - categorias: lista de categorías a mostrar. Si está vacía, se
+          muestran todas las categorías.
+
+        """
+        if len(categorias) == 0:
+            seleccion = None
+        else:
+            seleccion = set()
+            for categoria in categorias:
+                seleccion |= self.__por_categoria.get(categoria, set())
+        estado_equipos = self.__por_estado[filtro]
+
+        datos = {}
+        self.__filas = {}
+        fila = 0
+        for dorsal in self.__lista_ordenada(orden):
+            if seleccion is not None and dorsal not in seleccion:
+                continue
+            fila += 1
+            if dorsal in estado_equipos:
+                registro = self.__equipos[dorsal]
+                datos[fila] = registro
+                self.__filas[fila] = (
+                    dorsal, registro[self.__nombre],
+                    registro[self.__registrado], registro[self.__homologado])
+        return datos
+
+    def resumen(self):
+        """
+        Devuelve las estadísticas de los equipos del almacén, en el mismo
+        formato que la función resumen_equipos de la clase Conexion.
+
+        """
+        return {
+            "total": len(self.__por_estado[estado.TODOS]),
+            "inscrito": len(self.__por_estado[estado.INSCRITO]),
+            "registrado": len(self.__por_estado[estado.REGISTRADO]),
+            "homologado": len(self.__por_estado[estado.HOMOLOGADO])}
+
+    def equipo(self, fila):
+        """
+        Devuelve los datos del equipo que ocupa la fila indicada en la última
+        tabla generada: dorsal, nombre, registrado y homologado.
+
+        Los datos corresponden a lo que el usuario está viendo en la tabla, por
+        lo que no es necesario consultar la base de datos al pulsar sobre una
+        fila, y la fila no puede corresponder a otro equipo aunque se haya
+        modificado el orden de la tabla en otro puesto.
+
+        """
+        try:
+            return self.__filas[fila]
+        except KeyError:
+            raise RuntimeError("Fila %s inexistente en la tabla." % fila)
+
+    def __lista_ordenada(self, orden):
+        try:
+            return self.__ordenados[orden]
+        except KeyError:
+            lista = sorted(
+                self.__equipos, key=lambda d: self.__claves[d][orden])
+            self.__ordenados[orden] = lista
+            return lista
+
+    def __quitar_indices(self, dorsal, registro):
+        for dorsales in self.__por_estado.values():
+            dorsales.discard(dorsal)
+        self.__por_categoria[registro[self.__categoria]].discard(dorsal)
@@ -0,0 +1,152 @@
+'''
+Created on 18 oct 2026
+
+Árbol de puntos de homologación de una zona.
+
+La lista de puntos de una zona (descripción, nivel y sección a la que
+pertenece cada punto) es la misma para todos los equipos; sólo cambia el valor
+de cada punto. Por ello, el árbol se construye una única vez por zona a partir
+de la vista Homologacion_ListaPuntos, y se conserva durante toda la sesión
+(ver función lista_puntos_homologacion de la clase Conexion).
+
+Los nodos del árbol se guardan en el orden en el que se muestran en la página
+de edición (cada sección seguida de todos sus descendientes), de forma que los
+descendientes de una sección ocupan siempre posiciones consecutivas. Además de
+la lista de nodos, el árbol guarda en listas paralelas, indexadas por la
+posición de cada nodo, los datos necesarios para calcular qué puntos se
+muestran en la página: si es una sección, y la posición siguiente a la de su
+último descendiente (fin). Los valores de los puntos de cada equipo se guardan
+en otra lista con el mismo índice (ver función visibilidad).
+'''
+
+
+class NodoPunto(object):
+    # Los nodos sólo guardan datos, por lo que evitamos el diccionario de
+    # atributos de cada objeto.
+    __slots__ = ("punto", "nivel", "seccion", "descripcion", "fila", "numero",
+                 "fin")
+
+    def __init__(self, registro, fila, numero):
+        """
+        Argumentos:
+        - registro: registro del punto en la vista Homologacion_ListaPuntos.
+        - fila: fila que ocupa el punto en la página (empezando en 1). La
+          posición del nodo en el árbol es fila - 1.
+        - numero: numeración de la sección, subsección, etc, del tipo 1.1.2.
+
+        """
+        self.punto = registro["FK_HOMOLOGACION_PUNTO"]
+        self.nivel = registro["nivel"]
+        # Si es 0, indica que se trata de una sección y no de un punto.
+        self.seccion = registro["seccion"]
+        self.descripcion = registro["descripcion"]
+        self.fila = fila
+        self.numero = numero
+        # Posición siguiente a la del último descendiente. Los descendientes
+        # de este nodo ocupan las posiciones desde fila hasta fin - 1.
+        self.fin = fila
+
+
+class ArbolPuntos(object):
+
+    def __init__(self, lista):
+        """
+        Construye el árbol de puntos de una zona.
+
+        Argumentos:
+        - lista: lista de puntos, con el formato de la vista
+          Homologacion_ListaPuntos, ordenada por nivel, sección y punto. Los
+          valores de los puntos no se utilizan.
+
+        """
+        # Agrupamos los puntos por nivel (posición dentro de la lista de
+        # niveles existentes) y por la sección a la que pertenecen. Los puntos
+        # de primer nivel se agrupan todos juntos.
+        niveles = sorted({registro["nivel"] for registro in lista})
+        hijos = {}
+        for registro in lista:
+            indice = niveles.index(registro["nivel"])
+            seccion = (None if indice == 0 else
+                       registro["FK_HOMOLOGACION_SECCION"])
+            hijos.setdefault((indice, seccion), []).append(registro)
+
+        self.__nodos = []
+        self.__añadir_nodos(hijos, 0, None, "")
+        # Listas paralelas a la lista de nodos.
+        self.__fines = [nodo.fin for nodo in self.__nodos]
+        self.__secciones = [nodo.seccion == 0 for nodo in self.__nodos]
+
+    def __añadir_nodos(self, hijos, indice, seccion, prefijo):
+        """
+        Añade a la lista de nodos los puntos de una sección, cada uno seguido
+        de sus descendientes.
+
+        Argumentos:
+        - hijos: puntos agrupados por nivel y sección (ver constructor).
+        - indice: posición del nivel de los puntos a añadir.
+        - seccion: punto de la sección a la que pertenecen los puntos a añadir,
+          o None para los puntos de primer nivel.
+        - prefijo: numeración de la sección, a la que se añade el número de
+          orden de cada punto.
+
+        """
+        for orden, registro in enumerate(hijos.get((indice, seccion), ()), 1):
+            numero = "%s%i." % (prefijo, orden)
+            nodo = NodoPunto(registro, len(self.__nodos) + 1, numero)
+            self.__nodos.append(nodo)
+            if nodo.seccion == 0:
+                self.__añadir_nodos(hijos, indice + 1, nodo.punto, numero)
+            nodo.fin = len(self.__nodos)
+
+    def valores(self, valores):
+        """
+        Devuelve la lista de valores de los puntos de un equipo, en el orden
+        de los nodos del árbol.
+
+        Argumentos:
+        - valores: diccionario con el valor de cada punto.
+
+        """
+        return [valores.get(nodo.punto) for nodo in self.__nodos]
+
+    def visibilidad(self, valores):
+        """
+        Devuelve, para cada nodo del árbol, si se debe mostrar en la página.
+
+        Un nodo se muestra si todas las secciones que lo contienen tienen un
+        valor distinto de 0. El cálculo se realiza en una única pasada: al
+        encontrar una sección a 0, se saltan directamente todos sus
+        descendientes.
+
+        Argumentos:
+        - valores: lista de valores de los puntos (ver función valores).
+
+        """
+        visibles = [False] * len(self.__nodos)
+        posicion = 0
+        while posicion < len(visibles):
+            visibles[posicion] = True
+            if self.__secciones[posicion] and valores[posicion] == 0:
+                posicion = self.__fines[posicion]
+            else:
+                posicion += 1
+        return visibles
+
+    def puntos_visibles(self, posicion, visibles):
+        """
+        Devuelve las posiciones de los puntos (no secciones) descendientes de
+        la sección indicada que se muestran en la página.
+
+        Argumentos:
+        - posicion: posición de la sección.
+        - visibles: lista de visibilidad de los nodos (ver función
+          visibilidad).
+
+        """
+        return [p for p in range(posicion + 1, self.__fines[posicion])
+                if visibles[p] and not self.__secciones[p]]
+
+    def get_nodos(self):
+        return self.__nodos
+
+    nodos = property(get_nodos, None, None, None)
@@ -4,10 +4,14 @@ Created on 4 feb 2025
 @author: pedrogil
 '''
 
+from contextlib import contextmanager
+from datetime import timedelta
 from enum import IntEnum
 
 import mariadb
 
+from modelo.arbol_puntos import ArbolPuntos
+
 # Valores del filtro de la tabla de equipos.
 
 
@@ -38,13 +42,86 @@ ORDEN_TABLA = {
     2: "equipo",
     3: "competicion"}
 
+# Número de conexiones de la reserva empleada para las consultas de lectura.
+# Con 3 conexiones es suficiente para atender a la vez al hilo de refresco y a
+# la interfaz gráfica.
+TAMAÑO_RESERVA = 3
+
+# La tabla de registro de cambios (Homologacion_Cambios) guarda un registro
+# con el dorsal del equipo cada vez que se modifican sus datos (puntos,
+# comentarios o estado de registro), de tal forma que el refresco de la tabla
+# de equipos sólo tiene que descargar los equipos modificados desde el último
+# refresco. La tabla, los triggers que la rellenan y la eliminación de los
+# registros antiguos forman parte del esquema de la base de datos (ver script
+# sql/registro_cambios.sql).
+# Margen (en segundos) con el que se solapan las consultas de cambios, para no
+# perder los cambios de transacciones que se confirman justo durante la
+# consulta anterior.
+SOLAPE_CAMBIOS = 2
+
+
+class ConflictoEdicion(Exception):
+    """
+    Error al guardar en el modo de bloqueo optimista (ver clase Conexion):
+    otro usuario ha modificado, desde que se abrió la edición, alguno de los
+    puntos o el comentario que queremos guardar.
+
+    Argumentos:
+    - puntos: lista de puntos modificados por otro usuario.
+    - comentario: True si el comentario ha sido modificado por otro usuario.
+
+    """
+
+    def __init__(self, puntos, comentario=False):
+        super().__init__(
+            "Datos modificados por otro usuario: puntos %s%s" % (
+                puntos, ", comentario" if comentario else ""))
+        self.puntos = puntos
+        self.comentario = comentario
+
 
 class Conexion():
 
-    def __init__(self, user, password, host, database, timeout):
+    def __init__(self, user, password, host, database, timeout,
+                 escritura_diferida=False, bloqueo="equipo"):
         """
         Conectar a la base de datos
 
+        Se abren dos tipos de conexiones:
+        - Una conexión dedicada a la edición de equipos, sobre la que se abren
+          las transacciones que bloquean los registros del equipo mientras
+          la página de edición está abierta.
+        - Una reserva (pool) de conexiones en modo autocommit, para todas las
+          consultas de lectura (lista de equipos, resumen, etc.). De esta forma,
+          las consultas periódicas de la tabla nunca se ejecutan dentro de la
+          transacción de edición, no alargan la duración de los bloqueos, y
+          se pueden realizar a la vez que la edición (incluso desde otro hilo).
+
+        Si escritura_diferida es True, los cambios de puntos y comentarios
+        realizados durante la edición de un equipo no se envían a la base de
+        datos en el momento, sino que se acumulan y se escriben todos juntos
+        al guardar (ver función guardar). Como el equipo permanece bloqueado
+        durante toda la edición, nadie más puede modificarlo mientras tanto.
+
+        El argumento bloqueo indica qué se bloquea al editar un equipo (ver
+        función __bloquear_equipo):
+        - "equipo": todos los registros del equipo, incluido su estado.
+        - "zona": sólo los puntos y el comentario de la zona editada, de forma
+          que otros puestos pueden editar a la vez el resto de zonas del
+          equipo. En este modo, la escritura es siempre diferida, y al
+          guardar se bloquea el estado del equipo justo antes de escribir los
+          cambios y confirmarlos, de forma que los cambios de distintas zonas,
+          y el cálculo del estado del equipo que provocan, se realizan de uno
+          en uno (ver función guardar).
+        - "optimista": no se bloquea nada durante la edición. Los cambios se
+          acumulan siempre en memoria, junto con el valor que tenía cada
+          punto (y el comentario) al abrir la edición, que sirve como versión
+          del dato. Al guardar, se bloquean los registros sólo el tiempo de
+          escribirlos, y únicamente si ningún otro usuario ha modificado los
+          mismos datos mientras tanto (ver función __comprobar_versiones). En
+          caso contrario, no se guarda nada y se lanza ConflictoEdicion con
+          los puntos en conflicto.
+
         """
         # Comprobamos que podemos realizar la conexión a la base de datos.
         try:
@@ -55,6 +132,20 @@ class Conexion():
                 database=database,
                 autocommit=True,
                 connect_timeout=timeout)
+            # NOTA: No reiniciamos las conexiones al devolverlas a la reserva,
+            # ya que eso anularía el nivel de aislamiento fijado al crearlas.
+            self.__reserva = mariadb.ConnectionPool(
+                pool_name="homologacion_%i" % id(self),
+                pool_size=TAMAÑO_RESERVA,
+                pool_reset_connection=False,
+                user=user,
+                password=password,
+                host=host,
+                database=database,
+                autocommit=True,
+                connect_timeout=timeout,
+                init_command="SET SESSION TRANSACTION ISOLATION LEVEL "
+                "READ COMMITTED")
         except mariadb.OperationalError as error:
             raise ValueError("No es posible la conexión con %s(%s). %s",
                              (database, host, error))
@@ -81,12 +172,34 @@ class Conexion():
         self.__database = database
 
         # Obtenemos la lista de categorías existentes en la base de datos.
-        cursor_categorias = self.__conexion.cursor(
-            dictionary=True, prepared=True)
-        cursor_categorias.execute("SELECT * FROM GeneralCompeticion")
-        categorias = cursor_categorias.fetchall()
+        with self.__lectura(dictionary=True, prepared=True) as cursor:
+            cursor.execute("SELECT * FROM GeneralCompeticion")
+            categorias = cursor.fetchall()
         self.__categorias = tuple(c["ID_COMPETICION"] for c in categorias)
 
+        # Comprobamos si existe la tabla de registro de cambios. Si no existe
+        # (o no tenemos permisos), la tabla de equipos se refrescará siempre
+        # completa.
+        self.__registro_cambios = self.__comprobar_registro_cambios()
+        # Equipo que estamos editando, para añadirlo al registro de cambios al
+        # guardar sus datos.
+        self.__equipo_edicion = None
+        self.__zona_edicion = None
+        # Cambios pendientes de escribir en modo de escritura diferida: los
+        # puntos, indexados por (equipo, punto, zona), con su valor original y
+        # su nuevo valor, y el último comentario (texto, equipo, zona).
+        self.__bloqueo = bloqueo
+        self.__escritura_diferida = escritura_diferida or \
+            bloqueo in ("zona", "optimista")
+        self.__puntos_pendientes = {}
+        self.__comentario_pendiente = None
+        # En el modo optimista, comentario de la zona al abrir la edición,
+        # para detectar si otro usuario lo modifica antes de guardar.
+        self.__comentario_original = None
+        # Árboles de puntos de homologación ya construidos, indexados por
+        # zona (ver función lista_puntos_homologacion).
+        self.__arboles = {}
+
     def __str__(self):
         """
         Devuelve los datos informativos de la conexión.
@@ -97,82 +210,40 @@ class Conexion():
 ################################################################################
 ################################################################################
 ################################################################################
-    def lista_equipos(self, estado, orden, dorsal=None):
+    def lista_equipos(self, dorsal=None):
         """
-        Obtiene la lista de equipos filtrados por el valor de estado (ver
-        definición del tipo enumerado "estado"). Si equipo se corresponde con el
-        ID de un equipo, sólo obtiene los datos de este equipo (que puede ser
-        null si el equipo no cumple las condiciones del estado).
+        Obtiene la lista completa de equipos, con todos los campos de la vista
+        Homologacion_ListaEquipos, incluidos los campos registrado y
+        homologado, que determinan el estado del equipo.
+
+        El filtrado por estado y categoría, y la ordenación de la tabla de
+        equipos, se realizan en memoria (ver clase AlmacenEquipos), de tal
+        forma que cambiar de pestaña, de orden o de categorías no requiere
+        ninguna consulta a la base de datos.
 
         Argumentos:
-        - estado: permite filtrar en función del estado del equipo (ver
-          variable ESTADO).
-        - orden: Criterio de ordenación de los registros (ver variable
-          ORDEN_TABLA).
         - dorsal: Identificador del equipo. Si es None, se devuelve la lista
-          completa, en función de los criterios de filtrado. Si no es None,
-          se devuelve sólo los datos de ese equipo.
-
-        """
-        cursor = self.__conexion.cursor(dictionary=False, prepared=True)
-        filtro_registrado = ESTADO[estado][0]
-        filtro_homologado = ESTADO[estado][1]
-        # Obtenemos la lista de equipos a homologar.
-        consulta = "SELECT * FROM "
-        consulta += self.__vista_ordenada(orden)
-        consulta += "WHERE registrado IN %s AND homologado IN %s" % (
-            self.cadena_lista(filtro_registrado),
-            self.cadena_lista(filtro_homologado))
-        if dorsal is None:
-            # En el caso de que no nos pasen el dorsal del equipo, nos descargamos
-            # todos los equipos.
-            cursor.execute(consulta, filtro_registrado + filtro_homologado)
-        else:
-            # En el caso de que nos pasen el dorsal, sólo nos descargamos ese
-            # equipo.
-            consulta += " AND FK_EQUIPO = %s"
-            cursor.execute(consulta, filtro_registrado +
-                           filtro_homologado + (dorsal,))
-        equipos = cursor.fetchall()
-        return equipos
-
-    def lista_estado_equipos(self, orden, dorsal=None):
-        """
-        Devuelve el estado de cada uno de los equipos. El estado se determina a partir
-        de los campos registrado y homologado. El significado es:
-
-        - registrado=0: equipo no registrado, independientemente del estado del campo
-          homologado.
-        - registrado=0, homologado=1: registrado pero no homologado todavía.
-        - registrado=1, homologado=1: equipo ya homologado.
+          completa. Si no es None, se devuelve sólo los datos de ese equipo.
+          También puede ser una tupla de identificadores, para obtener los
+          datos de varios equipos.
 
         """
-        cursor = self.__conexion.cursor(dictionary=True, prepared=True)
-        consulta = "SELECT ORDEN, registrado, homologado FROM "
-        consulta += self.__vista_ordenada(orden)
-        if dorsal is None:
-            cursor.execute(consulta)
-        else:
-            consulta += " WHERE FK_EQUIPO = %s"
-            cursor.execute(consulta, (dorsal,))
-        equipos = cursor.fetchall()
+        consulta = "SELECT * FROM Homologacion_ListaEquipos"
+        with self.__lectura(dictionary=False, prepared=True) as cursor:
+            if dorsal is None:
+                # En el caso de que no nos pasen el dorsal del equipo, nos
+                # descargamos todos los equipos.
+                cursor.execute(consulta)
+            else:
+                # En el caso de que nos pasen el dorsal, sólo nos descargamos
+                # ese equipo (o equipos).
+                dorsales = dorsal if isinstance(dorsal, tuple) else (dorsal,)
+                consulta += " WHERE FK_EQUIPO IN %s" % self.cadena_lista(
+                    dorsales)
+                cursor.execute(consulta, dorsales)
+            equipos = cursor.fetchall()
         return equipos
 
-    def __dorsal_equipo(self, fila, orden):
-        """
-        Obtiene el dorsal del equipo a partir de la fila que ocupa en la tabla
-
-        """
-        cursor_dorsal = self.__conexion.cursor(prepared=True)
-        consulta = "SELECT FK_EQUIPO FROM "
-        consulta += self.__vista_ordenada(orden)
-        consulta += "WHERE ORDEN = %s"
-        cursor_dorsal.execute(consulta, (fila,))
-        if cursor_dorsal.rowcount != 1:
-            raise RuntimeError("Error en función de cambio de estado.")
-        dorsal = cursor_dorsal.fetchone()[0]
-        return dorsal
-
     def registrar_equipo(self, dorsal):
         """
         Alterna el estado de registro de un equipo
@@ -183,78 +254,88 @@ class Conexion():
           necesario determinar el dorsal a partir de la fila.
 
         """
-        # Determinamos el estado de registro del equipo, y cambiamos su estado.
-        estado_nuevo = 1 if (self.estado_equipo(dorsal) == 0) else 0
-
-        # Comprobamos que el equipo no esté bloqueado por otro usuario, y por
-        # tano no podemos cambiar su estado.
-        cursor_bloqueo = self.__conexion.cursor(prepared=True)
+        # Leemos el estado de registro del equipo a la vez que lo bloqueamos,
+        # dentro de una transacción, de forma que nadie lo pueda cambiar hasta
+        # que guardemos el nuevo estado. Si el equipo está bloqueado por otro
+        # usuario, no podemos cambiar su estado.
+        self.__conexion.autocommit = False
+        self.__conexion.begin()
         try:
-            cursor_bloqueo.execute(
-                "SELECT * FROM Homologacion_EstadoEquipo WHERE FK_EQUIPO = %s "
-                "FOR UPDATE NOWAIT", (dorsal,))
-        except mariadb.OperationalError as e:
-            # Detectamos si el equipo se encuentra bloqueado por otro usuario.
-            if e.errno == 1205:
-                raise BlockingIOError(
-                    "El equipo está bloqueado por otro usuario. "
-                    "Espere a que termine para poder continuar.")
-            else:
-                raise e
-
-        cursor_equipo = self.__conexion.cursor(prepared=True)
-        cursor_equipo.execute(
-            "UPDATE Homologacion_EstadoEquipo SET registrado=%s WHERE FK_EQUIPO=%s",
-            (estado_nuevo, dorsal))
-        if cursor_equipo.affected_rows != 1:
-            raise RuntimeError("Error en función de cambio de estado.")
-        self.__conexion.commit()
+            cursor = self.__conexion.cursor(prepared=True)
+            try:
+                cursor.execute(
+                    "SELECT registrado FROM Homologacion_EstadoEquipo "
+                    "WHERE FK_EQUIPO = %s FOR UPDATE NOWAIT", (dorsal,))
+            except mariadb.OperationalError as e:
+                # Detectamos si el equipo se encuentra bloqueado por otro
+                # usuario.
+                if e.errno == 1205:
+                    raise BlockingIOError(
+                        "El equipo está bloqueado por otro usuario. "
+                        "Espere a que termine para poder continuar.")
+                else:
+                    raise e
+            if cursor.rowcount != 1:
+                raise RuntimeError("Error en función de cambio de estado.")
+            estado_nuevo = 1 if cursor.fetchone()[0] == 0 else 0
+
+            cursor.execute(
+                "UPDATE Homologacion_EstadoEquipo SET registrado=%s "
+                "WHERE FK_EQUIPO=%s", (estado_nuevo, dorsal))
+            if cursor.affected_rows != 1:
+                raise RuntimeError("Error en función de cambio de estado.")
+            self.__añadir_cambio(dorsal)
+            self.__conexion.commit()
+        except Exception:
+            self.__conexion.rollback()
+            raise
+        finally:
+            self.__conexion.autocommit = True
 
     def estado_equipo(self, dorsal):
         """
         Determina el estado de registro de un equipo.
 
         """
-#        cursor_dorsal = self.__conexion.cursor(prepared=True)
-        cursor_estado = self.__conexion.cursor(prepared=True)
-#        # Determinamos el estado de registro del equipo, para alternarlo.
-        cursor_estado.execute(
-            "SELECT registrado FROM Homologacion_ListaEquipos "
-            "WHERE FK_EQUIPO = %s", (dorsal,))
-        if cursor_estado.rowcount != 1:
-            raise RuntimeError("Error en función de cambio de estado.")
-        estado_actual = cursor_estado.fetchone()[0]
+        with self.__lectura(prepared=True) as cursor_estado:
+            cursor_estado.execute(
+                "SELECT registrado FROM Homologacion_ListaEquipos "
+                "WHERE FK_EQUIPO = %s", (dorsal,))
+            if cursor_estado.rowcount != 1:
+                raise RuntimeError("Error en función de cambio de estado.")
+            estado_actual = cursor_estado.fetchone()[0]
         return estado_actual
 
-    def datos_equipo(self, fila, orden):
+    def resumen_equipos(self):
         """
-        Obtiene los datos del equipo a partir de la fila en la tabla
+        Estadísticas del proceso de homologación.
 
-        """
-        dorsal = self.__dorsal_equipo(fila, orden)
+        Devuelve un diccionario con el número de equipos total, inscritos (sin
+        registrar), registrados y homologados (ver función texto_resumen).
 
-        cursor = self.__conexion.cursor(dictionary=False, prepared=True)
-        cursor.execute(
-            "SELECT FK_EQUIPO, equipo FROM Homologacion_ListaEquipos WHERE FK_EQUIPO = %s",
-            (dorsal,))
+        NOTA: La barra de estado calcula estas estadísticas a partir de la
+        tabla de equipos (ver clase AlmacenEquipos), por lo que esta consulta
+        sólo se utiliza para comprobar de vez en cuando que coinciden.
 
-        nombre = cursor.fetchone()
-        return nombre[0], nombre[1]
+        """
+        with self.__lectura(dictionary=True, prepared=True) as cursor:
+            cursor.execute("SELECT * FROM Homologacion_ResumenEquipos")
+            if cursor.rowcount != 1:
+                raise RuntimeError("Error en la vista de resumen")
+            lista = cursor.fetchone()
+        return {campo: lista[campo] for campo in
+                ("total", "inscrito", "registrado", "homologado")}
 
-    def resumen_equipos(self):
+    @staticmethod
+    def texto_resumen(resumen):
         """
-        Estadísticas del proceso de homologación.
+        Texto de la barra de estado para las estadísticas indicadas (ver
+        función resumen_equipos).
 
         """
-        cursor = self.__conexion.cursor(dictionary=True, prepared=True)
-        cursor.execute("SELECT * FROM Homologacion_ResumenEquipos")
-        if cursor.rowcount != 1:
-            raise RuntimeError("Error en la vista de resumen")
-        lista = cursor.fetchone()
-        resumen = "Total: %i - Sin reg: %i - Reg: %i - Homol: %i" % (
-            lista["total"], lista["inscrito"],
-            lista["registrado"], lista["homologado"])
-        return resumen
+        return "Total: %i - Sin reg: %i - Reg: %i - Homol: %i" % (
+            resumen["total"], resumen["inscrito"],
+            resumen["registrado"], resumen["homologado"])
 
 ################################################################################
 ################################################################################
@@ -262,16 +343,38 @@ class Conexion():
 
     def lista_puntos_homologacion(self, equipo, zona):
         """
-        Obtiene la lista de puntos de homologación para la zona indicada.
+        Obtiene los puntos de homologación del equipo para la zona indicada.
 
-        """
-        self.__abrir_transaccion(equipo)
-        cursor = self.__conexion.cursor(dictionary=True, prepared=True)
-        cursor.execute(
-            "SELECT * FROM Homologacion_ListaPuntos WHERE "
-            "FK_EQUIPO = %s AND FK_HOMOLOGACION_ZONA = %s", (equipo, zona))
+        La lista de puntos es la misma para todos los equipos, por lo que el
+        árbol de puntos de cada zona (ver clase ArbolPuntos) sólo se construye
+        la primera vez que se abre la zona. El resto de veces, sólo se
+        consultan los valores de los puntos del equipo.
 
-        lista = cursor.fetchall()
+        Devuelve el árbol de puntos de la zona, un diccionario con el valor de
+        cada punto del equipo, y el comentario del equipo para la zona.
+
+        """
+        self.__abrir_transaccion(equipo, zona)
+        try:
+            arbol = self.__arboles[zona]
+        except KeyError:
+            cursor = self.__conexion.cursor(dictionary=True, prepared=True)
+            cursor.execute(
+                "SELECT * FROM Homologacion_ListaPuntos WHERE "
+                "FK_EQUIPO = %s AND FK_HOMOLOGACION_ZONA = %s", (equipo, zona))
+            lista = cursor.fetchall()
+            arbol = ArbolPuntos(lista)
+            self.__arboles[zona] = arbol
+        else:
+            cursor = self.__conexion.cursor(dictionary=True, prepared=True)
+            cursor.execute(
+                "SELECT FK_HOMOLOGACION_PUNTO, valor FROM Homologacion_Equipo "
+                "WHERE FK_EQUIPO = %s AND FK_HOMOLOGACION_ZONA = %s",
+                (equipo, zona))
+            lista = cursor.fetchall()
+        valores = {
+            registro["FK_HOMOLOGACION_PUNTO"]: registro["valor"]
+            for registro in lista}
 
         cursor2 = self.__conexion.cursor(prepared=True)
         cursor2.execute(
@@ -281,13 +384,17 @@ class Conexion():
             raise ValueError(
                 "Error en la tabla Comentario. Vuelve a registrar el equipo para proseguir.")
         comentario = cursor2.fetchone()
-        return lista, comentario[0]
+        self.__comentario_original = comentario[0]
+        return arbol, valores, comentario[0]
 
     def actualizar_comentario(self, equipo, zona, texto):
         """
         Actualiza el texto del campo comentario para el equipo y zona
 
         """
+        if self.__escritura_diferida:
+            self.__comentario_pendiente = (texto, equipo, zona)
+            return
         cursor = self.__conexion.cursor(dictionary=False, prepared=True)
         cursor.execute(
             "UPDATE Homologacion_Comentario SET comentario = %s "
@@ -300,74 +407,421 @@ class Conexion():
         if cursor.affected_rows > 1:
             raise RuntimeError("Error al añadir comentario de equipo.")
 
-    def actualizar_punto_homologacion(self, equipo, punto, zona):
+    def actualizar_punto_homologacion(self, equipo, punto, zona, valor):
         """
         Alterna el valor de un punto de homologación entre True y False
 
+        La actualización se realiza con una única sentencia. Como MariaDB no
+        permite devolver el nuevo valor desde un UPDATE, el llamante nos pasa
+        el valor actual del punto (el que está mostrando en la página). La
+        sentencia sólo modifica el punto si su valor en la base de datos
+        coincide con el indicado (valor <=> %s, ver función
+        __escribir_puntos), por lo que nunca se sobrescribe el cambio de otro
+        usuario, aunque el modo de bloqueo no bloquee el punto durante la
+        edición. En el modo optimista, además, la función
+        __comprobar_versiones detecta qué puntos ha modificado otro usuario
+        antes de escribir nada.
+
+        Argumentos:
+        - valor: valor actual del punto.
+
+        Devuelve el nuevo valor del punto.
+
         """
-        cursor_get = self.__conexion.cursor(dictionary=False, prepared=True)
-        cursor_set = self.__conexion.cursor(dictionary=False, prepared=True)
-        cursor_get.execute(
-            "SELECT valor FROM Homologacion_ListaPuntos WHERE "
-            "FK_EQUIPO = %s AND FK_HOMOLOGACION_PUNTO = %s AND "
-            "FK_HOMOLOGACION_ZONA = %s", (equipo, punto, zona))
+        nuevo = 0 if valor == 1 else 1
+        self.actualizar_puntos_homologacion(
+            equipo, zona, ((punto, valor),), nuevo)
+        return nuevo
 
-        if cursor_get.rowcount != 1:
-            raise RuntimeError("Error al actualizar punto de homoloación.")
-        valor = cursor_get.fetchone()[0]
+    def actualizar_puntos_homologacion(self, equipo, zona, puntos, valor):
+        """
+        Fija el mismo valor para un conjunto de puntos de homologación.
+
+        Todos los puntos se actualizan con una única llamada a executemany, por
+        ejemplo, para fijar todos los puntos de una sección.
+
+        Argumentos:
+        - puntos: lista de tuplas (punto, valor actual del punto). Igual que en
+          la función actualizar_punto_homologacion, sólo se modifican los
+          puntos cuyo valor coincida con el indicado.
+        - valor: nuevo valor para todos los puntos.
+
+        """
+        # Los puntos que ya tienen el valor pedido no se modifican, ya que no
+        # contarían como registros afectados.
+        datos = [(valor, equipo, punto, zona, actual)
+                 for punto, actual in puntos if actual != valor]
+        if self.__escritura_diferida:
+            for nuevo, equipo, punto, zona, actual in datos:
+                clave = (equipo, punto, zona)
+                # Si el punto ya estaba pendiente, conservamos su valor
+                # original, que es el que tiene en la base de datos.
+                original, __ = self.__puntos_pendientes.get(
+                    clave, (actual, None))
+                if nuevo == original:
+                    del self.__puntos_pendientes[clave]
+                else:
+                    self.__puntos_pendientes[clave] = (original, nuevo)
+            return
+        # Si se rechaza alguno de los puntos (por ejemplo, por un trigger,
+        # errno 1644), deshacemos también los puntos ya escritos, para que la
+        # página y la base de datos sigan coincidiendo. Un único punto no
+        # necesita punto de guardado, ya que se escribe con una sola sentencia.
+        if len(datos) <= 1:
+            self.__escribir_puntos(datos)
+            return
+        cursor = self.__conexion.cursor()
+        cursor.execute("SAVEPOINT puntos")
+        try:
+            self.__escribir_puntos(datos)
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT puntos")
+            raise
+
+    def __escribir_puntos(self, datos):
+        """
+        Escribe los puntos indicados con una única llamada a executemany.
 
-        valor = 0 if valor == 1 else 1
-        cursor_set.execute(
+        Argumentos:
+        - datos: lista de tuplas (nuevo valor, equipo, punto, zona, valor
+          actual).
+
+        """
+        if len(datos) == 0:
+            return
+        cursor = self.__conexion.cursor(dictionary=False, prepared=True)
+        cursor.executemany(
             "UPDATE Homologacion_Equipo SET valor = %s WHERE "
             "FK_EQUIPO = %s AND FK_HOMOLOGACION_PUNTO = %s AND "
-            "FK_HOMOLOGACION_ZONA = %s", (valor, equipo, punto, zona))
+            "FK_HOMOLOGACION_ZONA = %s AND valor <=> %s", datos)
 
-        if cursor_set.affected_rows != 1:
+        if cursor.affected_rows != len(datos):
             raise RuntimeError("Error al actualizar punto de homoloación.")
 
-        return valor
-
 
 ################################################################################
 ################################################################################
 ################################################################################
-    def __bloquear_equipo(self, equipo):
+    def __bloquear_equipo(self, equipo, zona):
         """
-        Bloquea todos los registros relacionados con este equipo en la bd.
+        Bloquea los registros relacionados con este equipo en la bd: todos
+        ellos, o sólo los de la zona indicada, en función del modo de bloqueo
+        (ver constructor).
 
         """
         # Bloqueamos a nivel de base de datos para que no se puedan modificar
         # por otro usuario hasta que no cierre el primer usuario.
-        cursor_equipo = self.__conexion.cursor(prepared=True)
-        cursor_puntos = self.__conexion.cursor(prepared=True)
+        if self.__bloqueo == "zona":
+            consultas = (
+                ("SELECT * FROM Homologacion_Equipo WHERE FK_EQUIPO = %s AND "
+                 "FK_HOMOLOGACION_ZONA = %s FOR UPDATE NOWAIT", (equipo, zona)),
+                ("SELECT * FROM Homologacion_Comentario WHERE FK_EQUIPO = %s "
+                 "AND FK_HOMOLOGACION_ZONA = %s FOR UPDATE NOWAIT",
+                 (equipo, zona)))
+            mensaje = "La zona %s del equipo está bloqueada por otro usuario." \
+                % zona
+        else:
+            consultas = (
+                ("SELECT * FROM Homologacion_EstadoEquipo WHERE FK_EQUIPO = %s "
+                 "FOR UPDATE NOWAIT", (equipo,)),
+                ("SELECT * FROM Homologacion_Equipo WHERE FK_EQUIPO = %s "
+                 "FOR UPDATE NOWAIT", (equipo,)))
+            mensaje = "El equipo está bloqueado por otro usuario."
+        cursor = self.__conexion.cursor(prepared=True)
         try:
-            cursor_equipo.execute(
-                "SELECT * FROM Homologacion_EstadoEquipo WHERE FK_EQUIPO = %s "
-                "FOR UPDATE NOWAIT", (equipo,))
-            cursor_puntos.execute(
-                "SELECT * FROM Homologacion_Equipo WHERE FK_EQUIPO = %s "
-                "FOR UPDATE NOWAIT", (equipo,))
+            for consulta, parametros in consultas:
+                cursor.execute(consulta, parametros)
+                cursor.fetchall()
         except mariadb.OperationalError as e:
             # Detectamos si el equipo se encuentra bloqueado por otro usuario.
             if e.errno == 1205:
                 raise BlockingIOError(
-                    "El equipo está bloqueado por otro usuario. "
-                    "Espere a que termine para poder continar.")
+                    mensaje + " Espere a que termine para poder continar.")
             else:
                 raise e
 
-    def __abrir_transaccion(self, equipo):
-        self.__conexion.autocommit = False
-        self.__conexion.begin()
-        self.__bloquear_equipo(equipo)
+    def __serializar_estado(self, equipo):
+        """
+        En los modos de bloqueo por zona y optimista, bloquea el estado del
+        equipo justo antes de escribir los cambios, esperando (como máximo el
+        tiempo fijado en innodb_lock_wait_timeout) a que terminen de guardar
+        los puestos que estén editando el mismo equipo. De esta forma, el
+        estado del equipo se calcula siempre con los datos ya confirmados del
+        resto de zonas.
+
+        """
+        cursor = self.__conexion.cursor(prepared=True)
+        cursor.execute(
+            "SELECT * FROM Homologacion_EstadoEquipo WHERE FK_EQUIPO = %s "
+            "FOR UPDATE", (equipo,))
+        cursor.fetchall()
+
+    def __comprobar_versiones(self, bloquear=False):
+        """
+        En el modo optimista, comprueba que los puntos y el comentario
+        pendientes de escribir siguen teniendo en la base de datos el valor
+        que tenían al abrir la edición (su versión). Si no es así, lanza
+        ConflictoEdicion con los puntos modificados por otro usuario.
+
+        Argumentos:
+        - bloquear: si es True, se bloquean los registros consultados, de
+          forma que nadie los pueda modificar hasta confirmar la transacción
+          (ver función guardar).
+
+        """
+        sufijo = " FOR UPDATE" if bloquear else ""
+        # Todos los puntos pendientes son del equipo y la zona en edición, por
+        # lo que basta con una consulta por cada zona.
+        zonas = {(equipo, zona) for equipo, __, zona
+                 in self.__puntos_pendientes}
+        actuales = {}
+        cursor = self.__conexion.cursor(prepared=True)
+        for equipo, zona in zonas:
+            cursor.execute(
+                "SELECT FK_HOMOLOGACION_PUNTO, valor FROM Homologacion_Equipo "
+                "WHERE FK_EQUIPO = %s AND FK_HOMOLOGACION_ZONA = %s" + sufijo,
+                (equipo, zona))
+            for punto, valor in cursor.fetchall():
+                actuales[(equipo, punto, zona)] = valor
+        conflictos = [
+            punto for (equipo, punto, zona), (original, __)
+            in self.__puntos_pendientes.items()
+            if actuales.get((equipo, punto, zona)) != original]
+
+        comentario = False
+        if self.__comentario_pendiente is not None:
+            cursor.execute(
+                "SELECT comentario FROM Homologacion_Comentario WHERE "
+                "FK_EQUIPO = %s AND FK_HOMOLOGACION_ZONA = %s" + sufijo,
+                self.__comentario_pendiente[1:])
+            fila = cursor.fetchone()
+            comentario = fila is None or fila[0] != self.__comentario_original
+
+        if len(conflictos) > 0 or comentario:
+            raise ConflictoEdicion(conflictos, comentario)
+
+    def __abrir_transaccion(self, equipo, zona):
+        # En el modo optimista no se abre ninguna transacción hasta guardar.
+        if self.__bloqueo != "optimista":
+            self.__conexion.autocommit = False
+            self.__conexion.begin()
+            self.__bloquear_equipo(equipo, zona)
+        self.__equipo_edicion = equipo
+        self.__zona_edicion = zona
+        self.__puntos_pendientes = {}
+        self.__comentario_pendiente = None
 
     def guardar(self):
-        self.__conexion.commit()
-        self.__conexion.autocommit = True
+        pendientes = len(self.__puntos_pendientes) > 0 or \
+            self.__comentario_pendiente is not None
+        if self.__bloqueo == "optimista" and not pendientes:
+            # No hay nada que guardar, por lo que no abrimos la transacción
+            # ni bloqueamos el estado del equipo.
+            pass
+        elif self.__bloqueo == "optimista":
+            # Abrimos la transacción justo ahora, y bloqueamos el estado del
+            # equipo y los registros a escribir sólo hasta confirmarla. Si
+            # otro usuario ha modificado los mismos datos, no se escribe nada.
+            # Si algo falla (error 1205 al esperar al estado del equipo,
+            # error 1644 de un trigger, o ConflictoEdicion), se deshace la
+            # transacción y se conservan los cambios pendientes, para que el
+            # usuario pueda volver a guardar o cancelar la edición.
+            self.__conexion.autocommit = False
+            self.__conexion.begin()
+            try:
+                self.__serializar_estado(self.__equipo_edicion)
+                self.__comprobar_versiones(bloquear=True)
+                self.__escribir_pendientes()
+                self.__añadir_cambio(self.__equipo_edicion)
+                self.__conexion.commit()
+            except Exception:
+                self.__conexion.rollback()
+                raise
+            finally:
+                self.__conexion.autocommit = True
+        elif self.__bloqueo == "zona":
+            # Los cambios de las distintas zonas del equipo se escriben de uno
+            # en uno: bloqueamos el estado del equipo justo antes de escribir,
+            # y lo liberamos al confirmar la transacción. Si el estado sigue
+            # bloqueado por otro puesto pasado el tiempo de espera, se lanza
+            # el error 1205.
+            try:
+                if pendientes:
+                    self.__serializar_estado(self.__equipo_edicion)
+                    self.__escribir_pendientes()
+                self.__añadir_cambio(self.__equipo_edicion)
+                self.__conexion.commit()
+            except Exception:
+                # El bloqueo del estado del equipo no se libera hasta
+                # finalizar la transacción, por lo que la deshacemos entera
+                # (los cambios siguen pendientes en memoria) y volvemos a
+                # bloquear la zona, para que el usuario pueda volver a guardar
+                # o cancelar la edición.
+                self.__conexion.rollback()
+                self.__conexion.begin()
+                self.__bloquear_equipo(
+                    self.__equipo_edicion, self.__zona_edicion)
+                raise
+            self.__conexion.autocommit = True
+        else:
+            # En modo de escritura diferida, escribimos ahora todos los
+            # cambios pendientes (si no se han escrito ya antes).
+            self.escribir_pendientes()
+            # Añadimos el cambio justo antes de confirmar la transacción, para
+            # que el registro sea visible prácticamente a la vez que se crea
+            # (ver función cambios_desde).
+            self.__añadir_cambio(self.__equipo_edicion)
+            self.__conexion.commit()
+            self.__conexion.autocommit = True
+        self.__equipo_edicion = None
+        self.__zona_edicion = None
+        self.__puntos_pendientes = {}
+        self.__comentario_pendiente = None
 
     def cancelar(self):
         self.__conexion.rollback()
         self.__conexion.autocommit = True
+        self.__equipo_edicion = None
+        self.__puntos_pendientes = {}
+        self.__comentario_pendiente = None
+
+    def escribir_pendientes(self):
+        """
+        Escribe en la base de datos los cambios pendientes de la edición, sin
+        confirmar la transacción.
+
+        Si alguna escritura falla (por ejemplo, por un trigger que rechaza el
+        nuevo valor de un punto, errno 1644), se deshacen sólo las escrituras
+        realizadas aquí y se relanza el error, manteniendo la transacción y los
+        cambios pendientes, para que el usuario pueda corregirlos y volver a
+        guardar.
+
+        En el modo de bloqueo por zona, no se escribe nada hasta guardar, ya
+        que para escribir hay que bloquear el estado del equipo, y no debe
+        quedar bloqueado mientras el usuario confirma o sigue editando (ver
+        función guardar).
+
+        En el modo optimista, tampoco se escribe nada hasta guardar, ya que no
+        hay ninguna transacción abierta: sólo se comprueba, sin bloquear, que
+        ningún otro usuario ha modificado los mismos datos, para avisar al
+        usuario antes de pedirle confirmación.
+
+        """
+        if len(self.__puntos_pendientes) == 0 and \
+                self.__comentario_pendiente is None:
+            return
+        if self.__bloqueo == "zona":
+            return
+        if self.__bloqueo == "optimista":
+            self.__comprobar_versiones()
+            return
+        cursor = self.__conexion.cursor()
+        cursor.execute("SAVEPOINT pendientes")
+        try:
+            self.__escribir_pendientes()
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT pendientes")
+            raise
+        self.__puntos_pendientes = {}
+        self.__comentario_pendiente = None
+
+    def __escribir_pendientes(self):
+        """
+        Escribe los cambios pendientes dentro de la transacción abierta. Los
+        cambios se mantienen en la lista de pendientes hasta que el llamante
+        sabe que se han escrito (o confirmado) correctamente.
+
+        """
+        self.__escribir_puntos([
+            (nuevo, equipo, punto, zona, original)
+            for (equipo, punto, zona), (original, nuevo)
+            in self.__puntos_pendientes.items()])
+        if self.__comentario_pendiente is not None:
+            cursor = self.__conexion.cursor()
+            cursor.execute(
+                "UPDATE Homologacion_Comentario SET comentario = %s "
+                "WHERE FK_EQUIPO = %s AND FK_HOMOLOGACION_ZONA = %s",
+                self.__comentario_pendiente)
+
+################################################################################
+################################################################################
+################################################################################
+    def __comprobar_registro_cambios(self):
+        """
+        Comprueba que existe la tabla de registro de cambios, creada por el
+        script sql/registro_cambios.sql. Devuelve False si no es posible
+        utilizar la tabla.
+
+        """
+        try:
+            with self.__lectura() as cursor:
+                cursor.execute("SELECT 1 FROM Homologacion_Cambios LIMIT 0")
+                cursor.fetchall()
+        except mariadb.Error:
+            return False
+        return True
+
+    def __añadir_cambio(self, equipo):
+        """
+        Añade el equipo al registro de cambios.
+
+        NOTA: Los triggers sobre las tablas de homologación ya registran cada
+        cambio, pero se ejecutan al modificar cada punto, dentro de la
+        transacción de edición, que puede durar varios minutos. En ese caso,
+        el registro se haría visible mucho después de su fecha, y la consulta
+        de cambios no lo detectaría. Por ello, la aplicación añade además un
+        registro justo antes de confirmar los cambios.
+
+        """
+        if not self.__registro_cambios or equipo is None:
+            return
+        cursor = self.__conexion.cursor(prepared=True)
+        cursor.execute(
+            "INSERT INTO Homologacion_Cambios(FK_EQUIPO) VALUES (%s)",
+            (equipo,))
+
+    def marca_cambios(self):
+        """
+        Devuelve la marca a partir de la cual se deben consultar los cambios
+        (ver función cambios_desde), o None si no existe registro de cambios.
+
+        La marca debe obtenerse antes de descargar la tabla completa, para no
+        perder los cambios que se produzcan durante la descarga.
+
+        """
+        if not self.__registro_cambios:
+            return None
+        with self.__lectura(prepared=True) as cursor:
+            cursor.execute("SELECT NOW(6)")
+            marca = cursor.fetchone()[0]
+        return marca
+
+    def cambios_desde(self, marca):
+        """
+        Devuelve los equipos modificados desde la marca indicada.
+
+        Devuelve una tupla con la nueva marca, para la siguiente consulta, y
+        una tupla con los dorsales de los equipos modificados. Si no existe
+        registro de cambios, devuelve None, y será necesario refrescar la
+        tabla completa.
+
+        NOTA: La consulta se solapa SOLAPE_CAMBIOS segundos con la anterior,
+        ya que un cambio registrado justo antes de obtener la marca anterior
+        puede no ser visible hasta que se confirme su transacción. Por ello,
+        un mismo equipo puede devolverse en dos consultas consecutivas.
+
+        """
+        if not self.__registro_cambios:
+            return None
+        with self.__lectura(prepared=True) as cursor:
+            cursor.execute("SELECT NOW(6)")
+            nueva_marca = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT DISTINCT FK_EQUIPO FROM Homologacion_Cambios "
+                "WHERE fecha > %s",
+                (marca - timedelta(seconds=SOLAPE_CAMBIOS),))
+            dorsales = tuple(c[0] for c in cursor.fetchall())
+        return nueva_marca, dorsales
 
     def columnas(self):
         """
@@ -375,51 +829,38 @@ class Conexion():
 
         """
         # Obtenemos los nombres de las columnas que forman la vista.
-        cursor = self.__conexion.cursor(dictionary=True, prepared=True)
-        cursor.execute("SHOW COLUMNS FROM Homologacion_ListaEquipos")
-        columnas = cursor.fetchall()
+        with self.__lectura(dictionary=True, prepared=True) as cursor:
+            cursor.execute("SHOW COLUMNS FROM Homologacion_ListaEquipos")
+            columnas = cursor.fetchall()
         return columnas
 
-    def __vista_ordenada(self, orden):
-        """
-        Devuelve la estructura de una subconsulta ordenada mendiante
-        la función ROW_NUMBER de SQL, siendo orden el criterio de ordenación
-        para la obtención del ROW NUMBER (ver variable ORDEN_TABLA)
-
-        """
-        # NOTA: Esto crea una vista temporal, que deberá ser consultada
-        # mediante una vista real, del tipo:
-        # SELECT * FROM
-        #    (SELECT ...
-        consulta = "(SELECT ROW_NUMBER() OVER (ORDER BY %s ASC) AS ORDEN, " \
-            "Homologacion_ListaEquipos.* FROM Homologacion_ListaEquipos " \
-            "%s ) " \
-            "AS subconsulta " % (
-                ORDEN_TABLA[orden], self.__filtro_categorias())
-        return consulta
-
-    def __filtro_categorias(self):
-        #        lista = tuple(
-        #            c["ID_COMPETICION"] for c in self.__categorias if c["ID_COMPETICION"] < 3)
-        if len(self.__categorias) == 0:
-            return ""
-        elif len(self.__categorias) == 1:
-            return "WHERE FK_COMPETICION = %s" % self.__categorias[0]
-        else:
-            return "WHERE FK_COMPETICION IN %s" % str(self.__categorias)
+    @contextmanager
+    def __lectura(self, **opciones):
+        """
+        Devuelve un cursor sobre una conexión de la reserva de lectura.
+
+        La conexión se devuelve a la reserva al salir del bloque with, por lo
+        que todos los datos se deben leer dentro del propio bloque.
+
+        """
+        conexion = self.__reserva.get_connection()
+        try:
+            yield conexion.cursor(**opciones)
+        finally:
+            conexion.close()
 
     def seleccion_categorias(self, categorias=None):
         """
         Función para seleccionar diferentes categorías en la tabla de equipos.
 
         """
-        cursor = self.__conexion.cursor(prepared=True, dictionary=True)
         if categorias is None:
             # Si el parámetro es None, significa que nos están solicitando la
             # lista de categorías existentes.
             # Obtenemos la lista de categorías en la base de datos.
-            cursor.execute("SELECT * FROM GeneralCompeticion")
-            categorias = cursor.fetchall()
+            with self.__lectura(prepared=True, dictionary=True) as cursor:
+                cursor.execute("SELECT * FROM GeneralCompeticion")
+                categorias = cursor.fetchall()
             for categoria in categorias:
                 categoria["titulo"] = categoria["nombre"]
                 categoria["valor"] = 1 if categoria["ID_COMPETICION"] in self.__categorias else 0
@@ -438,6 +879,11 @@ class Conexion():
         cadena = "(%s" + ", %s"*(len(lista)-1) + ")"
         return cadena
 
+    def __get_categorias(self):
+        return self.__categorias
+
+    categorias = property(__get_categorias, None, None, None)
+
 ################################################################################
 ################################################################################
 ################################################################################
@@ -11,6 +11,10 @@ import sys
 
 
 class Desplazamiento(object):
+    # Objeto que tiene asociados en este momento los eventos de
+    # desplazamiento. Los eventos se asocian a toda la aplicación (bind_all),
+    # por lo que un objeto no debe eliminar los eventos asociados por otro.
+    propietario = None
 
     def __init__(self, canvas, marco, barra):
         """
@@ -21,6 +25,10 @@ class Desplazamiento(object):
         self.__canvas = canvas
         self.__marco = marco
         self.__barra = barra
+        # Indica si el desplazamiento está activo (eventos asociados y barra
+        # visible), para sólo modificar los eventos cuando cambie. Inicialmente
+        # es None, para que la primera configuración se realice siempre.
+        self.__activo = None
         self.desp_vertical = True
 
 ################################################################################
@@ -76,7 +84,13 @@ class Desplazamiento(object):
         # Obtenmemos las alturas de ambos cuadros.
         alto_tabla = self.__marco.winfo_reqheight()
         alto_canvas = self.__canvas.winfo_height()
-        if not self.__desp_vertical or alto_tabla <= alto_canvas:
+        activo = self.__desp_vertical and alto_tabla > alto_canvas
+        # Sólo modificamos los eventos y la barra si cambia el estado, ya que
+        # esta función se llama cada vez que cambia el tamaño de la tabla.
+        if activo == self.__activo:
+            return
+        self.__activo = activo
+        if not activo:
             # Si el marco es más pequeño que el Canvas, deshabilitamos todas
             # las funciones de desplazamiento vertical.
             # O si el se ha seleccionado no desplazar, también lo
@@ -92,18 +106,22 @@ class Desplazamiento(object):
             # solicitado deshabilitar el desplazamiento.
             if self.__desp_vertical:
                 self.__canvas.yview("moveto", 0.0)
-            # Deshabilitamos el desplazamiento con la rueda del ratón
-            self.__canvas.unbind_all("<MouseWheel>")
-            self.__canvas.unbind_all("<Button-4>")
-            self.__canvas.unbind_all("<Button-5>")
-            # Deshabilitamos el desplazamiento con las teclas de cursor.
-            self.__canvas.unbind_all("<Up>")
-            self.__canvas.unbind_all("<Down>")
+            # Si los eventos son nuestros:
+            if Desplazamiento.propietario is self:
+                Desplazamiento.propietario = None
+                # Deshabilitamos el desplazamiento con la rueda del ratón
+                self.__canvas.unbind_all("<MouseWheel>")
+                self.__canvas.unbind_all("<Button-4>")
+                self.__canvas.unbind_all("<Button-5>")
+                # Deshabilitamos el desplazamiento con las teclas de cursor.
+                self.__canvas.unbind_all("<Up>")
+                self.__canvas.unbind_all("<Down>")
             # Ocultamos la barra de desplazamiento
             self.__barra.grid_forget()
         else:
             # En caso de que el marco sea más grande que el canvas:
             # habilitamos el desplazamiento con la rueda del ratón.
+            Desplazamiento.propietario = self
             if sys.platform == "linux" or sys.platform == "linux2":
                 self.__canvas.bind_all("<Button-4>", self.__rueda_raton)
                 self.__canvas.bind_all("<Button-5>", self.__rueda_raton)
@@ -4,6 +4,10 @@ Created on 7 mar 2025
 Widget derivado de Label, para incluir la funcionalidad requerida a éstas
 cuando el punto o la sección cambian de valor.
 
+Las etiquetas no muestran ni ocultan a sus descendientes. Qué etiquetas se
+muestran en cada momento lo decide la página a partir del árbol de puntos (ver
+función visibilidad de la clase ArbolPuntos).
+
 @author: pedrogil
 
 '''
@@ -21,8 +25,7 @@ class Etiqueta(tkinter.Label):
     @staticmethod
     def funcion_color(v, c): return None
 
-    def __init__(self, marco, punto, fila, nivel, seccion, valor,
-                 descendientes, **kwargs):
+    def __init__(self, marco, punto, fila, nivel, seccion, valor, **kwargs):
         """
         Argumentos:
         - marco: marco donde insertar la etiqueta.
@@ -32,8 +35,9 @@ class Etiqueta(tkinter.Label):
         - seccion: Si es 0, indica que se trata de una sección y no de un punto.
         - valor: valor actual, para asignarle el aspecto correspondiente en
           función de su valor.
-        - descedientes: lista de Etiquetas que son descendientes de esta
-          sección, si lo es.
+
+        NOTA: La etiqueta no se añade al marco hasta llamar a la función
+        añadir.
 
         """
         super().__init__(marco, **kwargs)
@@ -42,10 +46,10 @@ class Etiqueta(tkinter.Label):
         self.__nivel = nivel
         self.__seccion = seccion
         self.__valor = valor
-        self.__descendientes = descendientes
-        # En el propio constructor añadimos y hacemos visible la etiqueta en el
-        # marco anterior.
-        self.añadir()
+        # Margen horizontal del texto, y ancho disponible para el que se ha
+        # calculado el parámetro wraplength (ver función ajustar_ancho).
+        self.__margen = kwargs.get("padx", 0)
+        self.__ancho = None
 
     def añadir(self):
         """
@@ -54,11 +58,42 @@ class Etiqueta(tkinter.Label):
         """
         self.grid(
             row=self.__fila, column=0, sticky="nsew",
-            padx=(1 + 2*(self.__nivel-1)*self.indentacion, 1), pady=1)
+            padx=(self.__indentacion(), 1), pady=1)
+
+    def ajustar_ancho(self, ancho):
+        """
+        Ajusta el parámetro wraplength de la etiqueta para que el texto ocupe
+        varias líneas si no cabe en el ancho disponible.
+
+        El ancho de la etiqueta se calcula a partir del ancho del marco, sin
+        consultarlo a tkinter, y sólo se modifica la etiqueta si el ancho del
+        marco ha cambiado desde la última vez.
+
+        Argumentos:
+        - ancho: ancho del marco que contiene la etiqueta.
+
+        """
+        if ancho == self.__ancho:
+            return
+        self.__ancho = ancho
+        # El ancho de la etiqueta es el del marco menos la indentación, y el
+        # del texto, el de la etiqueta menos el margen (padx * 2).
+        ancho_etiqueta = ancho - self.__indentacion() - 1
+        self.config(wraplength=ancho_etiqueta - 2*self.__margen)
+
+    def __indentacion(self):
+        return 1 + 2*(self.__nivel-1)*self.indentacion
+
+    def ocultar(self):
+        """
+        Retira la etiqueta del marco, sin destruirla.
+
+        """
+        self.grid_remove()
 
     def actualizar(self, valor=None):
         """
-        Acualiza el aspecto de la etiqueta y de sus descendidentes.
+        Acualiza el aspecto de la etiqueta.
 
         Si valor no es None, se actualiza el valor de la etiqueta, y su aspecto,
         si es None, sólo actualiza su aspecto.
@@ -71,25 +106,16 @@ class Etiqueta(tkinter.Label):
         # la página.
         color = self.funcion_color(self.__valor, self.__seccion)
         self.config(bg=color)
-        # Si se trata de una sección, tendremos que ocultar o mostrar los
-        # puntos que dependen de esta sección.
-        if self.__seccion == 0:
-            if self.__valor == 0:
-                # Si valor es False, tenemos que ocultar todos sus
-                # descendientes.
-                for d in self.__descendientes:
-                    d.grid_forget()
-            else:
-                # Pero si el valor es True, tenemos que volver a mostrar sus
-                # descendientes.
-                for d in self.__descendientes:
-                    d.añadir()
-                    # Pero como es posible que alguno de sus descendientes sea
-                    # una sección, y es posible que esté a False, tenemos que
-                    # actualizar todos sus descendientes.
-                    # NOTA: En relación a esto, cualquier etiqueta que esté a
-                    # más de un nivel de profundidad, ejecutará el mensaje de
-                    # añadir (grid) más de una vez, pero por suerte, tkinter
-                    # no se ve afectado si llamamos a grid más de una vez sobre
-                    # la misma etiqueta.
-                    d.actualizar()
+
+    def get_punto(self):
+        return self.__punto
+
+    def get_seccion(self):
+        return self.__seccion
+
+    def get_valor(self):
+        return self.__valor
+
+    punto = property(get_punto, None, None, None)
+    seccion = property(get_seccion, None, None, None)
+    valor = property(get_valor, None, None, None)
@@ -4,45 +4,55 @@ Created on 14 feb 2025
 Módulo para construir la página donde nos aparecerán todos los puntos de
 homologación, en función de la zona y el equipo, y el campo comentario
 
+Cada página se construye una única vez por zona, y se reutiliza para todos los
+equipos que se editan en esa zona: al cerrar la página, sus controles no se
+destruyen, sino que se ocultan, y al abrirla para otro equipo sólo se
+actualizan los valores de los puntos, la cabecera y el comentario (ver función
+abrir).
+
 @author: pedrogil
 '''
 
 from functools import partial
-import tkinter
+import tkinter.messagebox
 
 import mariadb
 
 from leer_constantes import leer_fuente
+from modelo.base_datos import ConflictoEdicion
 from modelo.desplazamiento_tabla import Desplazamiento
 from modelo.etiqueta_punto import Etiqueta
+from modelo.tarea_aplazada import TareaAplazada
+
+# Tiempo (en milisegundos) que esperamos tras perder el foco el campo de
+# comentarios antes de guardar el comentario. Si el campo vuelve a perder el
+# foco antes de ese tiempo, se reinicia la espera.
+ESPERA_COMENTARIO = 1000
 
 
 class Pagina(object):
 
-    def __init__(self, marco, conexion, fila, orden, zona,
+    def __init__(self, marco, conexion, zona,
                  desbloquear, color_punto, color_borde="black",
                  margen_x=10, margen_y=5, indentacion=10):
         """
-        Genera la página con sus puntos de homologación
+        Genera la página de edición de puntos de homologación de una zona.
 
-        Al construir la página, se añaden todos los puntos, junto con sus
-        secciones, y les asigna el color y los oculta o desoculta en función
-        de su valor.
+        La página se construye oculta y sin puntos. Los puntos se añaden al
+        abrir la página para un equipo (ver función abrir), junto con sus
+        secciones, y se les asigna el color y se ocultan o desocultan en
+        función de su valor.
 
         Argumentos:
         - marco: Frame de tkinter donde construir la página
         - conexion
-        - fila: índice del equipo que estamos editando.
-        - orden: Criterio de ordenación de la tabla de equipos, para poder
-          relacionar la fila con el equipo.
-        - zona: zona de homologación que estamos editando.
+        - zona: zona de homologación de la página.
         - desbloquear: Función, si es necesaria, para desbloquear al módulo
           llamante, ya que inicialmente, esta página está pensada para bloquear
-          al módulo llamante mientras no la cerremos. Esta función es llamada
-          justo al finalizar la edición de esta página. Si el módulo llamante
-          no se bloquea, se puede pasar None. La función debe devolver True si
-          se sigue adelante con el desbloqueo, o False si no (por ejemplo, por
-          que el usuario ha cancelado la operación).
+          al módulo llamante mientras no la cerremos. Esta función se llama,
+          sin argumentos, justo al finalizar la edición de esta página, una
+          vez guardados (o descartados) los datos en la base de datos. Si el
+          módulo llamante no se bloquea, se puede pasar None.
         - color_punto: función que devuelve el color de un punto en función de
           su valor. Toma como argumento dos enteros, el valor del punto, y el
           nivel de sección, y devuelve un color de tkinter.
@@ -60,8 +70,10 @@ class Pagina(object):
         self.__desbloquear = desbloquear
         # la referencia a la base de datos.
         self.__conexion = conexion
-        # la referencia la marco donde insertar las etiquetas de los puntos.
-        self.__marco = marco
+        # el marco propio de la página, dentro del marco donde insertar las
+        # etiquetas de los puntos, que se muestra sólo mientras la página está
+        # abierta.
+        self.__marco = tkinter.Frame(marco)
         # el número de zona que estamos editando.
         self.__zona = zona
         # Fijamos el ancho de la indentacion de etiquetas. Se trata de un
@@ -73,24 +85,16 @@ class Pagina(object):
         ########################################################################
         ########################################################################
 
-        # Obtenemos el nombre y el dorsal del equipo.
-        self.__dorsal, nombre = conexion.datos_equipo(fila, orden)
-
-        # Obtenemos la lista de puntos a homologar, y los comentarios.
-        # NOTA: realizamos la consulta en este punto, antes de construir la
-        # interfaz, ya que es posible que el equipo esté bloquedo por otro
-        # usuario, y no podamos continuar.
-        lista_puntos, comentario = self.__conexion.lista_puntos_homologacion(
-            self.__dorsal, self.__zona)
+        # Dorsal del equipo que estamos editando (ver función abrir).
+        self.__dorsal = None
 
         ########################################################################
         ########################################################################
         # Construimos una cabecera para incluir el nombre del equipo.
-        cabecera = "(%i) %s - Zona %s" % (self.__dorsal, nombre, zona)
         fuente, color_fuente = leer_fuente("pagina")
-        tkinter.Label(
-            self.__marco, text=cabecera, height=1, font=fuente,
-            fg=color_fuente).grid(row=0, column=0, sticky="nsew", pady=5)
+        self.__cabecera = tkinter.Label(
+            self.__marco, height=1, font=fuente, fg=color_fuente)
+        self.__cabecera.grid(row=0, column=0, sticky="nsew", pady=5)
 
         # Otro marco donde mostrar los puntos de homologación.
         marco_canvas = tkinter.Frame(self.__marco)
@@ -108,9 +112,9 @@ class Pagina(object):
             row=2, column=0, sticky="w", padx=20, pady=(10, 1))
 
         # Asociamos el evento de pérdida de foco a guardar el texto que haya en
-        # ese momento en el campo.
+        # ese momento en el campo (ver función __programar_comentario).
         self.__campo_comentarios.bind(
-            "<FocusOut>", self.__guardar_comentario)
+            "<FocusOut>", self.__programar_comentario)
         # Asociamos la tecla enter del tecldo interno y externo a perder el
         # foco, de tal forma que provoca la ejecución del código anterior, y da
         # el foco al botón de guardar.
@@ -125,9 +129,11 @@ class Pagina(object):
         # campo de texto.
         self.__campo_comentarios.bind("<FocusIn>", self.__campo_ganar_foco)
 
-        # Iniciamos el campo con el texto que tuviera ya el campo en la bd.
-        if comentario is not None:
-            self.__campo_comentarios.insert("1.0", comentario)
+        # Guardamos el último texto escrito en la bd, para no volver a
+        # escribirlo si no ha cambiado, y el temporizador pendiente para
+        # guardarlo, si lo hay.
+        self.__comentario = ""
+        self.__temporizador_comentario = None
 
         # Y añadimos un marco con dos botones en la parte inferior de la página.
         botones = tkinter.Frame(self.__marco)
@@ -149,7 +155,6 @@ class Pagina(object):
         self.__boton_guardar.bind("<Return>", self.__guardar)
         self.__boton_cancelar.bind("<KP_Enter>", self.__cancelar)
         self.__boton_guardar.bind("<KP_Enter>", self.__guardar)
-        self.__boton_guardar.focus_set()
 
         ########################################################################
         ########################################################################
@@ -196,66 +201,24 @@ class Pagina(object):
         # Leemos la fuente que emplearemos para los puntos.
         fuente, color_fuente = leer_fuente("puntos")
 
-        # Creamos una lista temporal con todas las etiquetas, para poder
-        # ocultar y desocultarlas en función del valor de su sección. Como las
-        # etiquetas irán asignadas a los eventos de las propias etiquetas, no
-        # es necesario conservar una copia global de todas las etiquetas.
-        lista_etiquetas = {}
-
-        # Iteramos sobre todos los puntos de hommologación (ver definición del
-        # generador __lis_puntos para más detalles).
-        for elemento, fila, descendientes, numero in self.__lista_puntos(lista_puntos):
-            # Obtenemos los datos del registro de la base de datos
-            # correspondiente a este punto.
-            punto = elemento["FK_HOMOLOGACION_PUNTO"]
-            nivel = elemento["nivel"]
-            valor = elemento["valor"]
-            seccion = elemento["seccion"]
-
-            # Asociamos el evento del ratón con la función que permite cambiar
-            # el estado del punto.
-
-            # Antes de crear y añadir la etiqueta al marco, comprobamos si se
-            # trata de una sección o un punto normal.
-            seccion = elemento["seccion"]
-            if seccion == 0:
-                # Si se trata de una sección:
-                # Primero obtenemos las etiquetas que dependen de esta. Tened en
-                # cuenta que de acuerdo al proceso de ordenación de los puntos
-                # que realiza el generador de este bucle, los puntos
-                # dependientes se generan antes que la sección de la que
-                # depende, y por lo tanto, aquí ya tendremos las etiquetas
-                # construidas que necesitamos, aunque no estén construidas
-                # todas.
-                lista_etiquetas_desc = [
-                    v for k, v in lista_etiquetas.items() if k in descendientes]
-                # Definimos el tipoo de evento para las etiquetas. En caso de
-                # tratarse de una sección, le asignamos el doble click.
-                evento = "<Double-1>"
-            else:
-                # En caso de ser un punto, no tendrá descendientes.
-                lista_etiquetas_desc = None
-                # Si se trata de un punto, le asignamos el click.
-                evento = "<Button-1>"
-
-            # Construimos la etiqueta para este punto.
-            etiqueta = Etiqueta(
-                self.__pagina, punto, fila, nivel, seccion, valor,
-                lista_etiquetas_desc,
-                text="%s-%s" % (numero, elemento["descripcion"]),
-                font=fuente, fg=color_fuente,
-                anchor="w", justify=tkinter.LEFT, pady=margen_y, padx=margen_x)
-            # Actualizamos la apariencia de la etiqueta en función de su valor.
-            etiqueta.actualizar(valor)
-            # Asignamos el evento del ratón para que se actualice su valor.
-            # NOTA: En función de si es punto o sección, el evento se activa
-            # con click o doble click.
-            etiqueta.bind(evento, partial(
-                self.__actualizar_punto, punto, etiqueta))
-
-            # Añadimos la etiqueta a la lista global, por si hay que asignarla
-            # para otra etiqueta de nivel superior
-            lista_etiquetas[fila] = etiqueta
+        # Guardamos las opciones comunes a todas las etiquetas de los puntos,
+        # que se construyen a medida que se muestran (ver función
+        # __crear_etiqueta).
+        self.__opciones_etiqueta = {
+            "font": fuente, "fg": color_fuente, "anchor": "w",
+            "justify": tkinter.LEFT, "pady": margen_y, "padx": margen_x}
+
+        # Árbol de puntos de la zona, y en listas paralelas a los nodos del
+        # árbol (ver clase ArbolPuntos), el valor de cada punto, su etiqueta
+        # (None si todavía no se ha construido), y si la etiqueta se muestra
+        # actualmente en la página. Se rellenan al abrir la página.
+        self.__arbol = None
+        self.__valores = []
+        self.__etiquetas = []
+        self.__visibles = []
+        # Ancho de la página para el que se han ajustado las etiquetas (ver
+        # función __actualizar_tamaño).
+        self.__ancho = None
 
         # Hacemos que el ancho del marco que contiene a los puntos tome todo el
         # tamaño sobrante de la ventana.
@@ -263,22 +226,81 @@ class Pagina(object):
 
         # Ajustamos el evento de cambio de tamaño del canvas, por si la ventana
         # que lo contiene se hace más grande.
-        self.__canvas.bind("<Configure>", self.__actualizar_tamaño)
+        # NOTA: Todos los eventos que se produzcan en un mismo ciclo se
+        # atienden con un único ajuste (ver clase TareaAplazada).
+        self.__tarea_tamaño = TareaAplazada(
+            self.__canvas, self.__actualizar_tamaño)
+        self.__canvas.bind("<Configure>", self.__tarea_tamaño.programar)
         # y el tamaño del marco que contiene las etiquetas, que ocurre al
         # activar u ocultar una sección.
-        self.__pagina.bind("<Configure>",  self.__actualizar_tamaño)
+        self.__pagina.bind("<Configure>", self.__tarea_tamaño.programar)
 
         # Añadimos un módulo para implementar las funciones de desplazamiento
         # vertical de la página si el número de puntos a revisar es elevado y
         # no coge en la ventana.
+        # El desplazamiento no se habilita hasta abrir la página.
         self.__vertical = Desplazamiento(
             self.__canvas, self.__pagina, self.__barra)
-        
+        self.__vertical.desp_vertical = False
+
+    def abrir(self, dorsal, nombre):
+        """
+        Abre la página para editar los puntos de un equipo.
+
+        Argumentos:
+        - dorsal: dorsal del equipo que vamos a editar.
+        - nombre: nombre del equipo, para mostrarlo en la cabecera.
+
+        """
+        # Obtenemos la lista de puntos a homologar, y los comentarios.
+        # NOTA: realizamos la consulta en este punto, antes de modificar la
+        # interfaz, ya que es posible que el equipo esté bloquedo por otro
+        # usuario, y no podamos continuar.
+        arbol, valores, comentario = (
+            self.__conexion.lista_puntos_homologacion(dorsal, self.__zona))
+        self.__dorsal = dorsal
+
+        # Actualizamos la cabecera con el nombre del equipo.
+        self.__cabecera.config(
+            text="(%i) %s - Zona %s" % (dorsal, nombre, self.__zona))
+        # Iniciamos el campo con el texto que tuviera ya el campo en la bd.
+        self.__campo_comentarios.delete("1.0", "end")
+        if comentario is not None:
+            self.__campo_comentarios.insert("1.0", comentario)
+        self.__comentario = self.__campo_comentarios.get("1.0", "end-1c")
+
+        # El árbol de cada zona es siempre el mismo (ver función
+        # lista_puntos_homologacion de la clase Conexion), por lo que las
+        # etiquetas construidas para otros equipos se reutilizan.
+        if arbol is not self.__arbol:
+            for etiqueta in self.__etiquetas:
+                if etiqueta is not None:
+                    etiqueta.destroy()
+            self.__arbol = arbol
+            self.__etiquetas = [None] * len(arbol.nodos)
+            self.__visibles = [False] * len(arbol.nodos)
+        # Actualizamos el valor de las etiquetas ya construidas, sólo si ha
+        # cambiado.
+        self.__valores = arbol.valores(valores)
+        for etiqueta, valor in zip(self.__etiquetas, self.__valores):
+            if etiqueta is not None and etiqueta.valor != valor:
+                etiqueta.actualizar(valor)
+        # Mostramos las etiquetas cuyas secciones estén activas. Las etiquetas
+        # de los puntos de las secciones a 0 no se construyen hasta que no se
+        # active la sección, por lo que el coste de abrir la página depende
+        # sólo de los puntos que se muestran.
+        self.__actualizar_visibilidad()
+
+        # Mostramos la página desde el principio.
+        self.__canvas.yview("moveto", 0.0)
+        self.__marco.pack(expand=True, fill=tkinter.BOTH)
+        self.__vertical.desp_vertical = True
+        self.__boton_guardar.focus_set()
         # Antes de finalizar, actualizamos el tamaño del marco donde
         # aparecerán las etiquetas, para conseguir que su tamaño sea igual al
         # requerido por todas las etiquetas (o bien el scroll sea adecuado al
         # tamaño total).
-        self.__actualizar_tamaño()
+        self.__tarea_tamaño.programar()
 
 ################################################################################
 ################################################################################
@@ -287,42 +309,91 @@ class Pagina(object):
         Guardar todos los datos realizados hasta el momento y finalizar.
 
         """
-        try:
-            # Antes de finalizar, comprobamos si el usuario quiere guardar,
-            # o bien se ha confundido.
-            if not self.__desbloquear("¿Guardar datos?"):
-                # En caso de que el usuario no quiera guardar, salimos y
-                # esperamos a que el usuario vuelva a pulsar alguno de los
-                # botones.
-                return
-        except Exception:
-            # Es posible que el módulo llamante no nos pase ninguna función, ya
-            # que no necesita bloquearse. En ese caso, simplemente ignoramos
-            # la función.
-            pass
         # NOTA: Si el usuario pulsa Guardar sin hacer que el campo de
         # comentarios pierda el foco, es posible que no se haya guardado los
-        # comentarios.
+        # comentarios, por lo que lo guardamos aquí directamente.
         self.__boton_guardar.focus_set()
-        self.__conexion.guardar()
-        for control in self.__marco.winfo_children():
-            control.destroy()
-        # Lanzamos el evento de desbloqueo del módulo llamante.
+        self.__guardar_comentario()
+        # Si la conexión trabaja en modo de escritura diferida, los errores de
+        # los puntos aparecen al escribirlos, por lo que lo hacemos antes de
+        # desbloquear al módulo llamante. En caso de error, la página sigue
+        # abierta (y el equipo bloqueado) para que el usuario pueda corregir
+        # los datos y volver a guardar.
+        try:
+            self.__conexion.escribir_pendientes()
+        except mariadb.OperationalError as e:
+            self.__error_actualizacion(e)
+            return
+        except ConflictoEdicion as e:
+            self.__error_conflicto(e)
+            return
+        # Antes de finalizar, comprobamos si el usuario quiere guardar, o bien
+        # se ha confundido. En caso de que el usuario no quiera guardar,
+        # salimos y esperamos a que el usuario vuelva a pulsar alguno de los
+        # botones.
+        if not tkinter.messagebox.askokcancel(
+                "Finalizar edición equipo", "¿Guardar datos?"):
+            return
+        # En los modos de bloqueo por zona y optimista, los datos se escriben
+        # al guardar, por lo que los errores pueden aparecer también aquí
+        # (por ejemplo, si otro usuario ha modificado los datos justo después
+        # de comprobarlos). En ese caso no se guarda nada, y la página sigue
+        # abierta, igual que al escribir los cambios pendientes.
+        try:
+            self.__conexion.guardar()
+        except mariadb.OperationalError as e:
+            self.__error_actualizacion(e)
+            return
+        except ConflictoEdicion as e:
+            self.__error_conflicto(e)
+            return
+        except BlockingIOError as e:
+            # En el modo por zona, otro usuario ha bloqueado la zona tras
+            # deshacer el intento de guardar. Los cambios siguen pendientes.
+            tkinter.messagebox.showerror("Error edición equipo", e)
+            return
+        # Desbloqueamos al módulo llamante una vez confirmada la transacción,
+        # para que refresque el equipo con los datos ya guardados.
+        self.__finalizar()
 
     def __cancelar(self, evento=None):
         """
         Cancelar todos los datos realizados hasta el momento y finalizar.
 
         """
-        # Lanzamos el evento de desbloqueo del módulo llamante.
-        try:
-            if not self.__desbloquear("¿Cancelar modificaciones?"):
-                return
-        except Exception:
-            pass
+        if not tkinter.messagebox.askokcancel(
+                "Finalizar edición equipo", "¿Cancelar modificaciones?"):
+            return
+        self.__cancelar_temporizador_comentario()
         self.__conexion.cancelar()
-        for control in self.__marco.winfo_children():
-            control.destroy()
+        self.__finalizar()
+
+    def __finalizar(self):
+        """
+        Lanza el evento de desbloqueo del módulo llamante, si existe, y cierra
+        la página.
+
+        """
+        # El módulo llamante consulta el equipo editado, por lo que lo
+        # desbloqueamos antes de cerrar la página.
+        if self.__desbloquear is not None:
+            self.__desbloquear()
+        self.__cerrar()
+
+    def __cerrar(self):
+        """
+        Oculta la página, sin destruir sus controles, para reutilizarla con el
+        siguiente equipo que se edite en la misma zona.
+
+        """
+        # Cancelamos los ajustes de tamaño pendientes y liberamos el
+        # desplazamiento vertical, que está asociado a toda la aplicación (ver
+        # clase Desplazamiento).
+        self.__tarea_tamaño.cancelar()
+        self.__cancelar_temporizador_comentario()
+        self.__vertical.desp_vertical = False
+        self.__marco.pack_forget()
+        self.__dorsal = None
 
     def __campo_ganar_foco(self, evento=None):
         # Anulamos el desplazamiento vertical de la tabla de puntos, para
@@ -342,130 +413,43 @@ class Pagina(object):
         # haber pulsado la tecla Tab, se incluya un tabulador en el texto.
         return "break"
 
+    def __programar_comentario(self, evento=None):
+        """
+        Programa el guardado del comentario.
+
+        El campo pierde el foco continuamente (Return, Tab, click en los
+        puntos...), por lo que no guardamos el comentario inmediatamente, sino
+        pasado un tiempo sin volver a perder el foco. En cualquier caso, el
+        comentario se guarda siempre al pulsar el botón Guardar.
+
+        """
+        self.__cancelar_temporizador_comentario()
+        self.__temporizador_comentario = self.__campo_comentarios.after(
+            ESPERA_COMENTARIO, self.__guardar_comentario)
+
+    def __cancelar_temporizador_comentario(self):
+        if self.__temporizador_comentario is not None:
+            self.__campo_comentarios.after_cancel(
+                self.__temporizador_comentario)
+            self.__temporizador_comentario = None
+
     def __guardar_comentario(self, evento=None):
         """
-        Guardar los comentarios en la base de datos.
+        Guardar los comentarios en la base de datos, si han cambiado.
 
         """
+        self.__cancelar_temporizador_comentario()
         comentario = self.__campo_comentarios.get("1.0", "end-1c")
+        if comentario == self.__comentario:
+            return
         self.__conexion.actualizar_comentario(
             self.__dorsal, self.__zona, comentario)
+        self.__comentario = comentario
 
 ################################################################################
 ################################################################################
 
-    def __lista_puntos(self, lista):
-        """
-        Devuelve la lista de puntos para la página
-
-        La lista de puntos debe llevar el formato de la vista
-        Homologacion_ListaPuntos, cuyo orden es (equipo, zona, nivel, seccion,
-        punto) y devuelve un generador que itera sobre todos los puntos. Los
-        valores devueltos son:
-        - registro de la vista de la base de datos
-        - numero de orden (ver nota debajo)
-        - registros de niveles inferiores que son dependientes de éste (sección)
-        - numeración de la sección, subsección, etc, del tipo 1.1.2
-
-        """
-        # Convertimos la lista de puntos, en un diccionario de listas de puntos,
-        # separadas por niveles. Recordemos que la lista viene ordenada por
-        # "nivel" antes que por "seccion" y "punto".
-        lista_aux = []
-        actual = 0
-        nivel_actual = lista[0]["nivel"]
-        for indice, elemento in enumerate(lista):
-            if elemento["nivel"] == nivel_actual:
-                continue
-            lista_aux += [lista[actual:indice]]
-            nivel_actual = elemento["nivel"]
-            actual = indice
-        # El último nivel de la lista hay que generarlo fuera ya del bucle.
-        lista_aux += [lista[actual:indice+1]]
-
-        # En este punto, tenemos la lista completa separada en varias listas,
-        # tantas como distintos niveles tengamos, donde la primera lista sería
-        # la de nivel 1, y así sucesivamente.
-        # Y a continuación, implementamos un generador que devuelve el número
-        # de fila al que le corresponde en función de su posición y de los
-        # descendientes que tenga éste.
-        # NOTA: Esto no es posible obtenerlo de forma simple con SQL, por eso
-        # se hace en este punto.
-        yield from self.__lista_puntos_jerarquico(lista_aux, 1)
-
-    def __lista_puntos_jerarquico(self, listas, indice, prefijo="", seccion=None):
-        """
-        Generador recursivo, para devolver el orden de cada punto.
-
-        El generador toma la lista de listas de puntos, ordenadas por nivel
-        de sección, y devuelve el número de orden en función de su posición y
-        de sus descendientes, y los descendientes de este.
-
-        NOTA: El orden en el que se devuelven los datos no es el orden que le
-        corresponde en la tabla. En general, se devuelven antes los
-        descendientes que el propio elemento. Por lo tanto, el número de orden
-        debe emplearse para ordenarlos.
-
-        Para comprender este generador, se debe consultar también la tabla
-        HomologacionPunto y la vista Homologacion_ListaPuntos
-
-        Argumentos:
-        - listas: ver arriba
-        - indice: número de orden actual, para poder numerar cada punto con su
-          número de orden correcto.
-        - prefijo: valor actual del número de sección, como una cadena de texto,
-          a la cual se le añade el número de la subsección correspondiente.
-        - seccion: cuando estamos recorriendo todos los elementos de una
-          sección, este argumento nos vale para saber si este punto pertenece
-          a esta sección o no.
-
-        """
-        # Variable para llevar la numeración de la subsección en la que nos
-        # encontramos.
-        orden = 1
-        # Recorremos todos los elementos de la lista actual.
-        for elemento in listas[0]:
-            # Comprobamos si este punto pertenece a la sección que estamos
-            # recorriendo, ya que en cada lista, tenemos todos los puntos de
-            # un mismo nivel para todas las secciones existentes.
-            # Seccion None sólo ocurre para los puntos de primer nivel.
-            if seccion is None or elemento["FK_HOMOLOGACION_SECCION"] == seccion:
-                # Componemos el número de la sección, añadiendo el número de
-                # subsección al prefijo de la sección que lo contiene.
-                numero = "%s%s." % (prefijo, orden)
-                # La variable ultimo nos permite saber cual es el último indice
-                # asignado, para poder numerar los siguientes puntos a partir
-                # de este.
-                ultimo = indice
-                # Necesitamos generar también la lista de puntos que son
-                # descendientes de esta sección.
-                desc = []
-                # si se trata de una sección:
-                if elemento["seccion"] == 0:
-                    # Recorremos todos los puntos del siguiente nivel, para
-                    # comprobar cuales pertenecen a esta sección.
-                    for e, i, h, n in self.__lista_puntos_jerarquico(
-                            listas[1:], indice + 1, numero,
-                            elemento["FK_HOMOLOGACION_PUNTO"]):
-                        # Devolvemos el elemento, el índice y la lista de
-                        # descendientes de este punto.
-                        # Generamos el texto para el número de sección.
-                        yield e, i, h, n
-                        # Y añadimos el nuevo elemento a la lista de
-                        # descendientes de esta sección.
-                        desc += [i]
-                        # Además, tomamos nota del valor más alto añadido, ya
-                        # que para el siguiente punto deberemos empezar a
-                        # numerar a continuación de éste.
-                        if i > ultimo:
-                            ultimo = i
-                yield elemento, indice, desc, numero
-                orden += 1
-                # Y avanzamos el índice tantas unidades como puntos hayamos
-                # devuelto para esta sección.
-                indice = ultimo + 1
-
-    def __actualizar_punto(self, punto, etiqueta, evento=None):
+    def __actualizar_punto(self, posicion, evento=None):
         """
         Alterna el valor de un punto de homologación entre True y False 
 
@@ -481,56 +465,175 @@ class Pagina(object):
             self.__boton_guardar.focus_set()
 
         # Alternamos el valor del punto de homologación.
+        nodo = self.__arbol.nodos[posicion]
         try:
             valor = self.__conexion.actualizar_punto_homologacion(
-                self.__dorsal, punto, self.__zona)
+                self.__dorsal, nodo.punto, self.__zona,
+                self.__valores[posicion])
         except mariadb.OperationalError as e:
-            if e.errno == 1205:
-                # Time out:
-                tkinter.messagebox.showerror(
-                    "Tiempo de espera superado",
-                    "Datos del equipo bloqueado por otro usuario. "
-                    "Espere a que termine para poder edtirlo")
-            elif e.errno == 1644:
-                #
-                tkinter.messagebox.showerror(
-                    "Error en los datos del equipo", e)
-            else:
-                raise e
+            self.__error_actualizacion(e)
             return
 
-        # Actualizamos la apariencia de la etiqueta, y de sus descendientes si
-        # los tuviera.
-        etiqueta.actualizar(valor)
-        # Y también comprobamos si el tamaño de todo el marco ha cambiado, en
-        # caso de que alguna sección haya hecho aparecer o desaparecer
-        # etiquetas.
-        self.__actualizar_tamaño()
+        # Actualizamos el valor y la apariencia de la etiqueta.
+        self.__valores[posicion] = valor
+        self.__etiquetas[posicion].actualizar(valor)
+        # Si se trata de una sección, mostramos u ocultamos sus descendientes,
+        # y comprobamos si el tamaño de todo el marco ha cambiado.
+        if nodo.seccion == 0 and self.__actualizar_visibilidad():
+            self.__tarea_tamaño.programar()
+
+    def __actualizar_seccion(self, posicion, evento=None):
+        """
+        Fija el valor de todos los puntos visibles de una sección.
+
+        Si alguno de los puntos no está a 0, se ponen todos a 0. Si ya lo
+        estaban todos, se ponen todos a 1. Como un click por error puede
+        cambiar muchos puntos a la vez, se pide confirmación al usuario. Todos
+        los puntos se actualizan en la base de datos con una única llamada.
+
+        """
+        if not self.__vertical.desp_vertical:
+            self.__boton_guardar.focus_set()
+
+        # Si la sección está a 0, no tiene puntos visibles.
+        puntos = self.__arbol.puntos_visibles(posicion, self.__visibles)
+        if len(puntos) == 0:
+            return
+        valor = 1 if all(self.__valores[p] == 0 for p in puntos) else 0
+        nodos = self.__arbol.nodos
+        if not tkinter.messagebox.askokcancel(
+                "Modificar sección",
+                "¿Marcar como %s los %i puntos visibles de la sección "
+                "%s %s?" % ("correctos" if valor == 0 else "no correctos",
+                            len(puntos), nodos[posicion].numero,
+                            nodos[posicion].descripcion)):
+            return
+        try:
+            self.__conexion.actualizar_puntos_homologacion(
+                self.__dorsal, self.__zona,
+                [(nodos[p].punto, self.__valores[p]) for p in puntos], valor)
+        except mariadb.OperationalError as e:
+            self.__error_actualizacion(e)
+            return
+        # Como sólo se modifican puntos, y no secciones, no cambia el número
+        # de etiquetas visibles, y no es necesario actualizar el tamaño.
+        for p in puntos:
+            self.__valores[p] = valor
+            self.__etiquetas[p].actualizar(valor)
+
+    def __actualizar_visibilidad(self):
+        """
+        Muestra u oculta las etiquetas de la página en función del valor de
+        las secciones.
+
+        La visibilidad de todos los puntos se calcula en una única pasada
+        sobre el árbol de puntos, y sólo se muestran u ocultan las etiquetas
+        cuya visibilidad ha cambiado.
+
+        Devuelve True si alguna etiqueta ha cambiado.
+
+        """
+        visibles = self.__arbol.visibilidad(self.__valores)
+        cambios = False
+        for posicion, visible in enumerate(visibles):
+            if visible == self.__visibles[posicion]:
+                continue
+            if visible:
+                etiqueta = self.__etiquetas[posicion]
+                if etiqueta is None:
+                    etiqueta = self.__crear_etiqueta(posicion)
+                etiqueta.añadir()
+                # Si el ancho de la página ha cambiado mientras la etiqueta
+                # estaba oculta, ajustamos su texto al nuevo ancho.
+                if self.__ancho is not None:
+                    etiqueta.ajustar_ancho(self.__ancho)
+            else:
+                self.__etiquetas[posicion].ocultar()
+            cambios = True
+        self.__visibles = visibles
+        return cambios
+
+    def __crear_etiqueta(self, posicion):
+        """
+        Construye la etiqueta del punto que ocupa la posición indicada en el
+        árbol de puntos, la primera vez que se tiene que mostrar.
+
+        """
+        nodo = self.__arbol.nodos[posicion]
+        etiqueta = Etiqueta(
+            self.__pagina, nodo.punto, nodo.fila, nodo.nivel,
+            nodo.seccion, self.__valores[posicion],
+            text="%s-%s" % (nodo.numero, nodo.descripcion),
+            **self.__opciones_etiqueta)
+        # Actualizamos la apariencia de la etiqueta en función de su valor.
+        etiqueta.actualizar()
+        # Asignamos el evento del ratón para que se actualice su valor. En
+        # caso de tratarse de una sección, le asignamos el doble click, y si
+        # se trata de un punto, el click.
+        evento = "<Double-1>" if nodo.seccion == 0 else "<Button-1>"
+        etiqueta.bind(evento, partial(self.__actualizar_punto, posicion))
+        # En las secciones, el botón derecho fija de una vez el valor de
+        # todos los puntos visibles de la sección.
+        if nodo.seccion == 0:
+            etiqueta.bind("<Button-3>", partial(
+                self.__actualizar_seccion, posicion))
+        self.__etiquetas[posicion] = etiqueta
+        return etiqueta
+
+    def __error_actualizacion(self, e):
+        """
+        Muestra al usuario los errores al actualizar puntos de homologación.
+
+        """
+        if e.errno == 1205:
+            # Time out:
+            tkinter.messagebox.showerror(
+                "Tiempo de espera superado",
+                "Datos del equipo bloqueado por otro usuario. "
+                "Espere a que termine para poder edtirlo")
+        elif e.errno == 1644:
+            #
+            tkinter.messagebox.showerror(
+                "Error en los datos del equipo", e)
+        else:
+            raise e
+
+    def __error_conflicto(self, e):
+        """
+        Muestra al usuario los datos modificados por otro usuario en el modo
+        de bloqueo optimista (ver clase Conexion).
+
+        """
+        lineas = ["%s %s" % (nodo.numero, nodo.descripcion)
+                  for nodo in self.__arbol.nodos if nodo.punto in e.puntos]
+        if e.comentario:
+            lineas.append("Comentario")
+        tkinter.messagebox.showerror(
+            "Datos modificados por otro usuario",
+            "Los siguientes datos han sido modificados por otro usuario "
+            "mientras se editaba el equipo, por lo que no se han guardado los "
+            "cambios:\n\n%s\n\nCancele la edición y vuelva a abrir el "
+            "equipo para ver los datos actuales." % "\n".join(lineas))
 
     def __actualizar_tamaño(self, evento=None):
         """
         Actualizar los tamaños y funciones de scroll del canvas.
 
         """
-        # Actualizamos la página, para que se recalcule el espacio requerido
-        # una vez se sepa el número de líneas que ocupa cada etiqueta.
-        self.__pagina.update_idletasks()
-        # Fijamos el area de scroll del canvas.
-        r = self.__canvas.bbox("frame")
-        self.__canvas.configure(scrollregion=(1, 1, r[2], r[3]))
-
         # Ajustamos el ancho del frame que contiene las etiquetas al mismo
-        # ancho que el canvas que lo contiene.
+        # ancho que el canvas que lo contiene. Sólo si el ancho ha cambiado
+        # (no ocurre, por ejemplo, al activar o desactivar un punto), hay que
+        # ajustar el parámetro wraplength de las etiquetas visibles, para que
+        # sean multilinea para aquellos puntos que tengan el texto muy largo.
+        # Las etiquetas ocultas se ajustan al volver a mostrarse (ver función
+        # __actualizar_visibilidad).
         ancho = self.__canvas.winfo_width()
-        self.__canvas.itemconfig('frame', width=ancho)
-
-        # Ajustamos el parámetro wrraplength para que las etiquetas sean
-        # multilinea para aquellos puntos que tengan el texto muy largo.
-        # NOTA: hay que tener en cuenta que el ancho de la etiqueta es igual
-        # a la longitud del texto, más el margen (padx * 2).
-        for control in self.__pagina.winfo_children():
-            ancho_etiqueta = control.winfo_width()
-            control.config(wraplength=ancho_etiqueta - 2*control["padx"])
+        if ancho != self.__ancho:
+            self.__ancho = ancho
+            self.__canvas.itemconfig('frame', width=ancho)
+            for etiqueta, visible in zip(self.__etiquetas, self.__visibles):
+                if visible:
+                    etiqueta.ajustar_ancho(ancho)
 
         # Actualizamos la página, para que se recalcule el espacio requerido
         # una vez se sepa el número de líneas que ocupa cada etiqueta.
@@ -539,6 +642,9 @@ class Pagina(object):
         # adaptarnos al número de etiquetas visibles en este momento.
         altura = self.__pagina.winfo_reqheight()
         self.__canvas.itemconfig('frame', height=altura)
+        # Fijamos el area de scroll del canvas.
+        r = self.__canvas.bbox("frame")
+        self.__canvas.configure(scrollregion=(1, 1, r[2], r[3]))
 
         # Comprobamos si debemos habilitar o no las funciones de desplazamiento
         # vetical de la página.
@@ -0,0 +1,156 @@
+'''
+Created on 18 oct 2026
+
+Hilo de trabajo para refrescar de forma periódica los datos de la tabla de
+equipos sin bloquear la interfaz gráfica.
+
+Las consultas a la base de datos se realizan en un hilo independiente, sobre
+la reserva de conexiones de lectura, y los resultados se dejan en una cola que
+la interfaz gráfica vacía periódicamente mediante la función after de tkinter.
+De esta forma, una consulta lenta (por ejemplo, por una red wifi saturada) no
+congela la aplicación.
+
+Para reducir el volumen de datos, el hilo sólo descarga los equipos que han
+cambiado desde el refresco anterior (ver función cambios_desde de la clase
+Conexion). La tabla completa sólo se descarga al arrancar, cuando no existe
+registro de cambios, y cada cierto número de refrescos, para recoger cambios
+que no pasan por esta aplicación (por ejemplo, nombres de equipos).
+
+Las estadísticas de la barra de estado se calculan a partir de la propia tabla
+(ver clase AlmacenEquipos), por lo que la vista de resumen sólo se consulta
+cada cierto número de refrescos, para comprobar que ambas coinciden.
+'''
+
+import queue
+import threading
+
+# Número de refrescos tras los cuales se vuelve a descargar la tabla completa.
+REFRESCOS_COMPLETOS = 30
+# Refresco (dentro de cada ciclo de REFRESCOS_COMPLETOS) en el que se consulta
+# la vista de resumen. Se elige uno intermedio para que, si no coincide con la
+# tabla, dé tiempo a pedir un refresco completo antes del siguiente ciclo.
+REFRESCO_RESUMEN = REFRESCOS_COMPLETOS // 2
+
+
+class Refresco(threading.Thread):
+
+    def __init__(self, conexion):
+        """
+        Construye el hilo de refresco (hay que llamar a start para arrancarlo).
+
+        Argumentos:
+        - conexion: objeto Conexion de la aplicación. El hilo sólo realiza
+          consultas de lectura, que se atienden desde la reserva de conexiones
+          (ver clase Conexion), por lo que nunca comparte una conexión con la
+          interfaz gráfica.
+
+        """
+        super().__init__(daemon=True)
+        self.__conexion = conexion
+        # Cola de peticiones de refresco, rellenada por la interfaz gráfica.
+        self.__peticiones = queue.Queue()
+        # Cola de resultados, vaciada por la interfaz gráfica.
+        self.__resultados = queue.Queue()
+        # Marca del último refresco (ver función cambios_desde de la clase
+        # Conexion). Si es None, el siguiente refresco será completo.
+        self.__marca = None
+        # Número de refrescos realizados, para saber cuándo realizar un
+        # refresco completo.
+        self.__refrescos = 0
+
+    def solicitar(self, completo=False):
+        """
+        Solicita un nuevo refresco de los datos de la tabla.
+
+        Si completo es True, se descarga la tabla completa, aunque exista
+        registro de cambios (por ejemplo, si las estadísticas de la tabla no
+        coinciden con las de la base de datos).
+
+        NOTA: Los datos no dependen del filtro, del orden ni de las categorías
+        seleccionadas en la tabla, ya que éstos se aplican en memoria (ver
+        clase AlmacenEquipos).
+
+        """
+        self.__peticiones.put(completo)
+
+    def finalizar(self):
+        """
+        Finaliza el hilo una vez atendidas las peticiones pendientes.
+
+        """
+        self.__peticiones.put(None)
+
+    def resultados(self):
+        """
+        Generador que devuelve, sin bloquear, los resultados disponibles.
+
+        Cada resultado es un diccionario con la lista de equipos (ver función
+        lista_equipos de la clase Conexion) y el resumen de la base de datos
+        (ver función resumen_equipos), o None si en este refresco no se ha
+        consultado. La clave "completo" indica si la lista contiene todos los
+        equipos, o sólo los equipos modificados. Si la consulta ha fallado, el
+        diccionario sólo contiene la clave "error" con la excepción producida.
+
+        """
+        while True:
+            try:
+                yield self.__resultados.get_nowait()
+            except queue.Empty:
+                return
+
+    def run(self):
+        while True:
+            peticion = self.__peticiones.get()
+            # Si la red va lenta, es posible que se hayan acumulado varias
+            # peticiones mientras atendíamos la anterior. En ese caso, las
+            # atendemos todas con un único refresco, que será completo si
+            # alguna de ellas lo pedía.
+            while peticion is not None and not self.__peticiones.empty():
+                siguiente = self.__peticiones.get_nowait()
+                peticion = None if siguiente is None else peticion or siguiente
+            if peticion is None:
+                return
+            if peticion:
+                self.__marca = None
+            try:
+                lista, completo = self.__consultar()
+                resumen = None
+                if self.__refrescos % REFRESCOS_COMPLETOS == REFRESCO_RESUMEN:
+                    resumen = self.__conexion.resumen_equipos()
+            except Exception as error:
+                # El error se lanza desde la interfaz gráfica al recoger el
+                # resultado, igual que ocurría al refrescar desde el propio
+                # bucle de eventos. Capturamos cualquier excepción (no sólo las
+                # de la base de datos, ver por ejemplo la función
+                # resumen_equipos), para que el hilo no finalice por un único
+                # refresco erróneo. Como no sabemos qué cambios se han perdido,
+                # el siguiente refresco debe ser completo.
+                self.__marca = None
+                self.__resultados.put({"error": error})
+                continue
+            self.__refrescos += 1
+            self.__resultados.put({
+                "completo": completo,
+                "lista": lista,
+                "resumen": resumen})
+
+    def __consultar(self):
+        """
+        Descarga la tabla completa o sólo los equipos modificados.
+
+        Devuelve la lista de equipos, y si se trata de la tabla completa.
+
+        """
+        if self.__marca is not None and \
+                self.__refrescos % REFRESCOS_COMPLETOS != 0:
+            cambios = self.__conexion.cambios_desde(self.__marca)
+            if cambios is not None:
+                self.__marca, dorsales = cambios
+                if len(dorsales) == 0:
+                    # No ha cambiado nada desde el último refresco.
+                    return [], False
+                return self.__conexion.lista_equipos(dorsales), False
+        # La marca se obtiene antes de descargar la tabla, para no perder los
+        # cambios que se produzcan durante la descarga.
+        self.__marca = self.__conexion.marca_cambios()
+        return self.__conexion.lista_equipos(), True
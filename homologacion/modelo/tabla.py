@@ -28,14 +28,32 @@ La tabla quedaría:
 Entre los parámetros de la tabla figura el ancho, en píxeles, de cada columna.
 Si el ancho es 0, significa que no se debe añadir esa columna.
 
+Junto con los datos, se puede pasar a la tabla el color de cada celda,
+calculado previamente a partir de los datos (ver función refrescar). En ese
+caso, la tabla no necesita calcular el color de las celdas una a una.
+
+La tabla dispone de un modo virtual, para tablas con muchas filas. En este
+modo, en lugar de crear las etiquetas de todas las filas, sólo se crean las
+necesarias para las filas visibles (más unas pocas por encima y por debajo),
+que se reutilizan para mostrar otras filas a medida que se desplaza la tabla.
+El resto de funciones de la tabla se utilizan igual en ambos modos.
+
+En modo normal, las filas nuevas no se construyen todas a la vez, sino en
+bloques de duración limitada (ver variable PRESUPUESTO_BLOQUE), empezando por
+las filas visibles. Cada bloque se programa como un temporizador, de forma que
+la ventana sigue respondiendo mientras se construye una tabla con muchas
+filas.
+
 @author: pedrogil
 '''
 
 
 from functools import partial
+import time
 import tkinter
 
 from modelo.desplazamiento_tabla import Desplazamiento
+from modelo.tarea_aplazada import TareaAplazada
 
 # Variable auxiliar para convertir códigos de alinación con los códigos
 # requiridos por el argumento anchor de tkinter.
@@ -44,6 +62,18 @@ ANCHOR = {
     "L": "w",
     "R": "e"}
 
+# Número de filas adicionales que se construyen por encima y por debajo de la
+# parte visible de la tabla en modo virtual, para que al desplazar la tabla no
+# se vean filas vacías antes de rellenarlas.
+FILAS_MARGEN = 5
+
+# Tiempo máximo, en milisegundos, que se dedica a construir filas nuevas antes
+# de devolver el control al bucle de eventos de tkinter (ver función
+# __construir_pendientes).
+PRESUPUESTO_BLOQUE = 8
+# Espera, en milisegundos, entre dos bloques de construcción de filas.
+ESPERA_BLOQUE = 1
+
 
 class Tabla(object):
 
@@ -60,7 +90,8 @@ class Tabla(object):
                  fuente_cabecera=("LIBERATION SANS", 20, ""),
                  color_fuente_cabecera="black",
                  fuente_filas=("LIBERATION SANS", 12, ""),
-                 color_fuente_filas="black"):
+                 color_fuente_filas="black",
+                 virtual=False):
         """
         Construcción de la tabla, y configuración.
 
@@ -82,6 +113,8 @@ class Tabla(object):
         - color_xxx
         - fuente_cabecera (familia, tamaño, atributos)
         - fuente_datos (familia, tamaño, atributos)
+        - virtual: si es True, la tabla funciona en modo virtual (ver
+          descripción del módulo).
 
         NOTA: Antes de construir la tabla, se chequea que todos los parámetros
         anteriores tengan el mismo número de elementos. Si no es así, se
@@ -103,6 +136,11 @@ class Tabla(object):
         self.__color_fuente_filas = color_fuente_filas
         # Guardamos la forma de alinear el texto de las etiquetas.
         self.__alineacion = alineacion
+        # Y el resto de datos necesarios para construir las filas en modo
+        # virtual.
+        self.__virtual = virtual
+        self.__ajuste = ajuste
+        self.__color_borde = color_borde
         # Comprobamos que todos los argumentos tengan el mismo número de
         # elementos.
         self.__columnas = len(ancho)
@@ -209,31 +247,80 @@ class Tabla(object):
 
         # Asociamos eventos para que se ajuste todo cuando cambie el tamaño del
         # canvas (porque se ha redimensionado la ventana principal) o el marco
-        # (porque se han añadido / quitado filas).
-        self.__marco_tabla.bind("<Configure>", self.__actualizar_tamaño)
-        self.__canvas.bind("<Configure>", self.__actualizar_tamaño)
+        # (porque se han añadido / quitado filas). Todos los eventos que se
+        # produzcan en un mismo ciclo se atienden con un único ajuste.
+        self.__tarea_tamaño = TareaAplazada(
+            self.__canvas, self.__actualizar_tamaño)
+        self.__marco_tabla.bind("<Configure>", self.__tarea_tamaño.programar)
+        self.__canvas.bind("<Configure>", self.__tarea_tamaño.programar)
 
         # Creamos un diccionario para guardar la lista de etiquetas que
         # representan las celdas, para poder acceder a ellas cuando queramos
-        # actualizar o borrar filas.
+        # actualizar o borrar filas. Para cada fila se guarda también el texto
+        # y el color mostrados en cada celda, para no volver a configurar las
+        # celdas que no cambian (ver función __pintar_celda).
         self.__controles = {}
+        # Reserva de filas eliminadas de la tabla. Las filas eliminadas no se
+        # destruyen, sino que se retiran del grid y se guardan aquí, para
+        # reutilizarlas al añadir nuevas filas (por ejemplo, al cambiar de
+        # pestaña o de orden).
+        self.__reserva_filas = []
+        # Filas pendientes de construir, con sus valores y colores, y tarea
+        # que construye el siguiente bloque de filas (ver función
+        # __construir_pendientes).
+        self.__pendientes = {}
+        self.__tarea_filas = TareaAplazada(
+            self.__canvas, self.__construir_pendientes, ESPERA_BLOQUE)
         # Creamos una lista de todos los eventos que tenemos que añaidr en las
         # celdas de las tablas.
         self.__eventos = {}
+        # Los eventos de las celdas no se asocian a cada etiqueta, sino a una
+        # etiqueta de eventos (bindtag) común a todas las celdas de la tabla,
+        # con un único evento para cada tipo de evento (ver función
+        # añadir_evento). El índice de celdas permite saber, a partir de la
+        # etiqueta que ha producido el evento, sus controles y su columna.
+        self.__etiqueta_eventos = "TablaCeldas%i" % id(self)
+        self.__secuencias = set()
+        self.__celdas = {}
         # Función para configurar el color de las celdas para cada columna.
         # Si para una columna concreta la clave no existe en el diccionario,
         # la celda se representará con el color por defecto.
         self.__color_columna = {}
 
+        # Datos para el modo virtual:
+        # - datos de todas las filas de la tabla, en el mismo formato que el
+        #   argumento de la función refrescar, y colores de sus celdas (si se
+        #   han indicado).
+        self.__datos = {}
+        self.__colores_datos = {}
+        # - lista ordenada de filas, para saber la posición de cada fila.
+        self.__posiciones = []
+        # - filas cuyos datos han cambiado desde que se mostraron.
+        self.__modificadas = set()
+        # - lista de huecos: cada hueco es un marco con las etiquetas de una
+        #   fila, que se reutiliza para mostrar distintas filas (ver función
+        #   __mostrar_huecos).
+        self.__huecos = []
+        # - altura de cada fila, incluyendo el borde (ver función añadir_fila).
+        self.__alto_fila = alto_datos + 2
+
         # Al iniciar la tabla, permitimos la activación del desplazamiento
         # vertical de la tabla.
         self.__vertical = Desplazamiento(
             self.__canvas, self.__marco_tabla, self.__barra)
 
+        if self.__virtual:
+            # En modo virtual, las filas se colocan con place, por lo que la
+            # altura del marco la fijamos nosotros (ver función
+            # __actualizar_virtual), y cada vez que se desplace la tabla hay
+            # que actualizar las filas construidas.
+            self.__marco_tabla.grid_propagate(False)
+            self.__canvas.config(yscrollcommand=self.__desplazar)
+
 
 ################################################################################
 ################################################################################
-    def refrescar(self, datos, solo_actualizar=False):
+    def refrescar(self, datos, solo_actualizar=False, colores=None):
         """
         Actualizar los datos de la tabla. La función debe recibir los datos
         en un formato similar al descrito en la función formatear_lista_tabla.
@@ -247,14 +334,30 @@ class Tabla(object):
         necesidad de estar mandando el resto de filas que no deben ser
         refrescadas.
 
+        La variable colores permite indicar el color de las celdas de cada
+        fila: un diccionario con las mismas claves que datos, y para cada fila,
+        una lista con el color de cada columna. Si una fila no existe en el
+        diccionario, o el color de una columna es None, el color se calcula
+        con la configuración de la columna (ver función definir_color_columna).
+
         """
+        if colores is None:
+            colores = {}
+        if self.__virtual:
+            if solo_actualizar:
+                datos = {f: v for f, v in datos.items() if f in self.__datos}
+                self.__actualizar_virtual(datos, colores=colores)
+            else:
+                self.__actualizar_virtual(
+                    datos, reemplazar=True, colores=colores)
+            return
         # Guardamos el total de filas que tenemos antes de añadir o eliminar
         # ninguna fila.
         total = len(self.__controles)
-        # Determinamos las filas que existn en datos y no en controles, es
-        # decir, las nuevas filas añadidas. Para ello, convertimos los
-        # diccionarios en sets.
-        s1 = set(self.__controles.keys())
+        # Determinamos las filas que existn en datos y no en controles (ni
+        # están pendientes de construir), es decir, las nuevas filas añadidas.
+        # Para ello, convertimos los diccionarios en sets.
+        s1 = set(self.__controles.keys()) | set(self.__pendientes.keys())
         s2 = set(datos.keys())
 
         if not solo_actualizar:
@@ -267,38 +370,225 @@ class Tabla(object):
                 self.borrar_fila(f)
 
             # Añadimos las nuevas filas:
-            for f in añadir:
-                self.añadir_fila(f, datos[f])
+            self.__añadir_filas({f: datos[f] for f in añadir}, colores)
 
         # Resto de filas.
         actualizar = s1 & s2
         # Actualizamos el resto de filas.
         for f in actualizar:
-            self.refrescar_fila(f, datos[f])
+            self.refrescar_fila(f, datos[f], colores.get(f))
 
         # Solo si hay un cambio en el número de filas, refrescamos el tamaño
         # de la tabla, ya que en ocasiones la actualización no se produce.
         if len(self.__controles) != total:
-            self.__marco_tabla.update_idletasks()
-            self.__actualizar_tamaño()
+            self.__tarea_tamaño.programar()
 
-    def añadir_fila(self, fila, valores):
+    def actualizar_filas(self, datos, borrar=(), colores=None):
         """
-        Añadir una nueva fila. Implica crear los marcos y etiquetas asociadas.
+        Actualiza sólo las filas indicadas, sin tener en cuenta el resto de
+        filas de la tabla. Las filas de datos que no existan en la tabla se
+        añaden, las que ya existan se refrescan, y las filas incluidas en la
+        lista borrar se eliminan (si existen).
+
+        Esta opción es necesaria para refrescar la tabla a partir de los
+        cambios producidos en la base de datos, sin necesidad de volver a
+        enviar el resto de filas.
+
+        Los colores se indican igual que en la función refrescar.
+
+        """
+        if colores is None:
+            colores = {}
+        if self.__virtual:
+            self.__actualizar_virtual(datos, borrar, colores=colores)
+            return
+        total = len(self.__controles)
+        for f in borrar:
+            self.borrar_fila(f)
+        nuevas = {}
+        for f, valores in datos.items():
+            if f in self.__controles or f in self.__pendientes:
+                self.refrescar_fila(f, valores, colores.get(f))
+            else:
+                nuevas[f] = valores
+        self.__añadir_filas(nuevas, colores)
+        # Al igual que al refrescar la tabla completa, si cambia el número de
+        # filas, refrescamos el tamaño de la tabla.
+        if len(self.__controles) != total:
+            self.__tarea_tamaño.programar()
+
+    def añadir_fila(self, fila, valores, colores=None):
+        """
+        Añadir una nueva fila. Implica crear los marcos y etiquetas asociadas,
+        o bien reutilizar las de una fila eliminada anteriormente.
+
+        La variable colores es la lista con el color de cada columna de la
+        fila (ver función refrescar).
 
         """
         # Comprobamos si la fila está repetida.
-        if fila in self.__controles:
+        if (fila in self.__controles or fila in self.__datos or
+                fila in self.__pendientes):
             raise ValueError("Fila repetida")
 
         if len(valores) != self.__columnas:
             raise ValueError(
                 "Error añadir fila: número de columnas incorrecto")
 
+        if self.__virtual:
+            self.__actualizar_virtual(
+                {fila: valores}, colores={fila: colores})
+            return
+        self.__construir_fila(fila, valores, colores)
+
+    def borrar_fila(self, fila):
+        """
+        Elimina la fila indicada.
+
+        """
+        if self.__virtual:
+            self.__actualizar_virtual({}, (fila,))
+            return
+        # Si la fila todavía no se ha construido, basta con no construirla.
+        if self.__pendientes.pop(fila, None) is not None:
+            return
+        try:
+            controles = self.__controles.pop(fila)
+        except KeyError:
+            return
+        # Retiramos los controles de la interfaz, ya que sólo elimnandolos de
+        # la lista no es suficiente para que desaparezcan, y los guardamos en
+        # la reserva para reutilizarlos.
+        for control in controles['F'].values():
+            control.grid_remove()
+        controles["fila"] = None
+        self.__reserva_filas.append(controles)
+
+    def refrescar_fila(self, fila, valores, colores=None):
+        """
+        Actualiza el texto de la fila indicada, y el color de sus celdas (ver
+        función añadir_fila).
+
+        """
+        if self.__virtual:
+            if fila not in self.__datos:
+                raise ValueError("Fila a actualizar no existe.")
+            if len(valores) != self.__columnas:
+                raise ValueError(
+                    "Error al actualizar fila: número de columnas incorrecto")
+            self.__actualizar_virtual(
+                {fila: valores}, colores={fila: colores})
+            return
+        if len(valores) != self.__columnas:
+            raise ValueError(
+                "Error al actualizar fila: número de columnas incorrecto")
+        # Si la fila todavía no se ha construido, se construirá directamente
+        # con los nuevos valores.
+        if fila in self.__pendientes:
+            self.__pendientes[fila] = (valores, colores)
+            return
+        try:
+            controles = self.__controles[fila]
+        except KeyError:
+            raise ValueError("Fila a actualizar no existe.")
+
+        etiquetas = controles['L']
+        for columna in etiquetas:
+            # Asignamos el texto de la celda, y su color, en fucnión del valor.
+            self.__pintar_celda(
+                etiquetas[columna], controles['V'], fila, columna,
+                valores[columna], colores)
+
+################################################################################
+################################################################################
+    # Construcción de filas por bloques (modo normal).
+################################################################################
+################################################################################
+    def __añadir_filas(self, datos, colores):
+        """
+        Añade las filas indicadas a la lista de filas pendientes de construir,
+        y construye el primer bloque, empezando por las filas visibles. El
+        resto de bloques se construyen en los siguientes ciclos del bucle de
+        eventos.
+
+        """
+        for fila, valores in datos.items():
+            if len(valores) != self.__columnas:
+                raise ValueError(
+                    "Error añadir fila: número de columnas incorrecto")
+            self.__pendientes[fila] = (valores, colores.get(fila))
+        if len(self.__pendientes) > 0:
+            self.__construir_pendientes()
+
+    def __construir_pendientes(self):
+        """
+        Construye filas pendientes hasta agotar el tiempo de un bloque (ver
+        variable PRESUPUESTO_BLOQUE), y programa el siguiente bloque si
+        todavía quedan filas.
+
+        NOTA: Los bloques se programan como temporizadores, y no con
+        after_idle, ya que el ajuste de tamaño de la tabla llama a
+        update_idletasks, que ejecutaría en ese momento todos los bloques
+        pendientes (cada uno programando el siguiente), bloqueando la ventana
+        hasta construir la tabla completa. Por el mismo motivo, el ajuste de
+        tamaño sólo se programa al construir el último bloque.
+
+        """
+        inicio = time.perf_counter()
+        for fila in self.__orden_pendientes():
+            valores, colores = self.__pendientes.pop(fila)
+            self.__construir_fila(fila, valores, colores)
+            if (time.perf_counter() - inicio) * 1000 >= PRESUPUESTO_BLOQUE:
+                break
+        if len(self.__pendientes) > 0:
+            self.__tarea_filas.programar()
+        else:
+            self.__tarea_tamaño.programar()
+
+    def __orden_pendientes(self):
+        """
+        Devuelve las filas pendientes de construir, en el orden en el que se
+        deben construir: primero las que quedan en la parte visible de la
+        tabla, y después el resto, de arriba a abajo.
+
+        """
+        # Todas las filas ocupan la misma altura, por lo que la posición de
+        # cada fila en la tabla es su posición en la lista ordenada de filas.
+        filas = sorted(set(self.__controles) | set(self.__pendientes))
+        primera = int(self.__canvas.canvasy(0)) // self.__alto_fila
+        visibles = self.__canvas.winfo_height() // self.__alto_fila + 1
+        orden = [f for f in filas[primera:primera + visibles]
+                 if f in self.__pendientes]
+        ya_incluidas = set(orden)
+        orden += [f for f in filas
+                  if f in self.__pendientes and f not in ya_incluidas]
+        return orden
+
+    def __construir_fila(self, fila, valores, colores=None):
+        """
+        Construye los controles de una fila (ver función añadir_fila).
+
+        """
+        # Si hay alguna fila en la reserva, la volvemos a colocar en el grid
+        # en su nueva posición, y sólo modificamos las celdas que cambien.
+        if len(self.__reserva_filas) > 0:
+            controles = self.__reserva_filas.pop()
+            controles["fila"] = fila
+            for columna, marco_celda in controles["F"].items():
+                marco_celda.grid(row=fila)
+                self.__pintar_celda(
+                    controles["L"][columna], controles["V"], fila, columna,
+                    valores[columna], colores)
+            self.__controles[fila] = controles
+            return
+
         # Guardamos en sendos diccionarios los marcos y etiquetas que creamos
         # para representar la fila.
         fila_celdas = {}
         fila_marcos = {}
+        fila_valores = {}
+        controles = {
+            "fila": fila, "L": fila_celdas, "F": fila_marcos, "V": fila_valores}
         for columna, dato in enumerate(valores):
             if self.__ancho[columna] == 0:
                 # Si el ancho es 0, nos indican que no debemos añadir esta
@@ -311,64 +601,23 @@ class Tabla(object):
             marco_celda.grid(
                 row=fila, column=columna, sticky="nsew", padx=1, pady=1)
             marco_celda.pack_propagate(False)
-            # Y creamos la etiqueta dentro del marco anterior.
+            # Y creamos la etiqueta dentro del marco anterior, con el color
+            # de la celda en función de la configuración.
+            texto = dato if dato is not None else ""
+            color = self.__color_celda(fila, columna, texto, colores)
             etiqueta_celda = tkinter.Label(
                 marco_celda, fg=self.__color_fuente_filas,
-                text=dato, font=self.__fuente_filas,
+                text=texto, bg=color, font=self.__fuente_filas,
                 anchor=ANCHOR[self.__alineacion[columna]], padx=10)
-            # Asighamos el color de la celda en función de la configuración
-            self.__color_celda(fila, columna, etiqueta_celda)
+            fila_valores[columna] = (texto, color)
             etiqueta_celda.pack(fill=tkinter.BOTH, expand=True)
-            # comprobamos si hay que añadir también eventos a la etiqueta.
-            for ev in self.__eventos.get(columna, []):
-                # En este caso, el primer elemento incluye el nombre del
-                # evento, y el segundo el noombre de la función.
-                evento = ev[0]
-                funcion = ev[1]
-                etiqueta_celda.bind(evento, partial(funcion, fila))
+            # Añadimos la etiqueta al sistema de eventos de la tabla.
+            self.__registrar_celda(etiqueta_celda, controles, columna)
 
             fila_celdas[columna] = etiqueta_celda
             fila_marcos[columna] = marco_celda
         # Actualizamos la lista de controles añadidos.
-        self.__controles[fila] = {"L": fila_celdas, "F": fila_marcos}
-
-    def borrar_fila(self, fila):
-        """
-        Elimina la fila indicada.
-
-        """
-        try:
-            controles = self.__controles[fila]
-        except KeyError:
-            return
-        # Eliminamos los controles de la interfaz, ya que sólo elimnandolos de
-        # la lista no es suficiente para que desaparezcan.
-        for control in controles['F'].values():
-            control.destroy()
-        del self.__controles[fila]
-
-    def refrescar_fila(self, fila, valores):
-        """
-        Actualiza el texto de la fila indicada.
-
-        """
-        try:
-            controles = self.__controles[fila]
-        except KeyError:
-            raise ValueError("Fila a actualizar no existe.")
-
-        if len(valores) != self.__columnas:
-            raise ValueError(
-                "Error al actualizar fila: número de columnas incorrecto")
-
-        etiquetas = controles['L']
-        for columna in etiquetas:
-            etiqueta = etiquetas[columna]
-            # Asignamos el texto de la celda.
-            valor = valores[columna]
-            etiqueta.config(text=valor if valor is not None else "")
-            # y su color, en fucnión del valor.
-            self.__color_celda(fila, columna, etiqueta)
+        self.__controles[fila] = controles
 
 ################################################################################
 ################################################################################
@@ -391,12 +640,14 @@ class Tabla(object):
         except KeyError:
             self.__eventos[columna] = [(evento, funcion)]
 
-        # Asociamos el evento a todas las filas que ya estén añadidas. Se puede
-        # comprobar que al añadir nuevas filas, a estás también se les añade el
-        # evento.
-        for fila, controles in self.__controles.items():
-            controles['L'][columna].bind(
-                evento, partial(funcion, fila))
+        # El evento se asocia una única vez a la etiqueta de eventos de la
+        # tabla, por lo que afecta a todas las filas, tanto las que ya estén
+        # añadidas como las nuevas (ver función __delegar_evento).
+        if evento not in self.__secuencias:
+            self.__secuencias.add(evento)
+            self.__marco_tabla.bind_class(
+                self.__etiqueta_eventos, evento,
+                partial(self.__delegar_evento, evento))
 
     def añadir_evento_cabecera(self, evento, columna, funcion):
         """
@@ -463,6 +714,10 @@ class Tabla(object):
 ################################################################################
     def __actualizar_tamaño(self, event=None):
 
+        # Actualizamos el marco, para que se recalcule el espacio requerido
+        # por las filas añadidas o eliminadas.
+        self.__marco_tabla.update_idletasks()
+
         # Capturamos la altura actual del marco que contiene los datos,
         # para determinar la porción de tabla que se ve sobre la ventana.
         r = self.__canvas.bbox("frame")
@@ -473,7 +728,7 @@ class Tabla(object):
         # Si la tabla se queda sin datos, el tamaño del marco no se
         # actualiza, con lo que no se genera el evento de redimensionamiento
         # y por tanto no se queda con su altura igual a 0
-        if len(self.__controles) == 0:
+        if len(self.__controles) == 0 and len(self.__datos) == 0:
             # Fijamos su tamaño a 1 píxel, para que se siga representando
             # el borde.
             altura = 1
@@ -489,15 +744,225 @@ class Tabla(object):
         # Hacemos que el ancho del frame donde se crea la tabla se ajuste
         # al ancho del canvas donde lo hemos añadido.
         self.__canvas.itemconfig('frame', width=self.__canvas.winfo_width())
+        # En modo virtual, si cambia la altura del canvas, puede cambiar el
+        # número de filas visibles.
+        if self.__virtual:
+            self.__mostrar_huecos()
 
 ################################################################################
 ################################################################################
+    # Funciones del modo virtual.
+################################################################################
+################################################################################
+    def __actualizar_virtual(self, datos, borrar=(), reemplazar=False,
+                             colores=None):
+        """
+        Actualiza los datos de la tabla en modo virtual.
 
-    def __color_celda(self, fila, columna, etiqueta):
+        Argumentos:
+        - datos: filas a añadir o actualizar.
+        - borrar: filas a eliminar.
+        - reemplazar: si es True, los datos sustituyen a todas las filas de la
+          tabla.
+        - colores: colores de las celdas de las filas de datos (ver función
+          refrescar).
+
+        """
+        if colores is None:
+            colores = {}
+        if reemplazar:
+            reordenar = datos.keys() != self.__datos.keys()
+            self.__datos = dict(datos)
+            self.__colores_datos = {}
+        else:
+            reordenar = False
+            for f in borrar:
+                self.__colores_datos.pop(f, None)
+                if self.__datos.pop(f, None) is not None:
+                    reordenar = True
+            for f, valores in datos.items():
+                if f not in self.__datos:
+                    reordenar = True
+                self.__datos[f] = valores
+        for f in datos:
+            self.__colores_datos[f] = colores.get(f)
+        self.__modificadas.update(datos)
+        if reordenar:
+            self.__posiciones = sorted(self.__datos)
+            # La altura del marco es la de todas las filas, aunque sólo se
+            # construyan las visibles.
+            self.__marco_tabla.config(
+                height=max(1, len(self.__posiciones) * self.__alto_fila))
+            self.__tarea_tamaño.programar()
+        self.__mostrar_huecos()
+
+    def __desplazar(self, *args):
+        """
+        Evento de desplazamiento del canvas en modo virtual.
+
+        """
+        self.__barra.set(*args)
+        self.__mostrar_huecos()
+
+    def __mostrar_huecos(self):
+        """
+        Muestra en los huecos las filas visibles en la parte actual de la tabla.
+
+        Cada posición de la tabla se muestra siempre en el mismo hueco (la
+        posición módulo el número de huecos), por lo que al desplazar la
+        tabla, los huecos de las filas que dejan de verse por un lado se
+        reutilizan para las filas que aparecen por el otro.
+
+        """
+        inicio = int(self.__canvas.canvasy(0)) // self.__alto_fila
+        visibles = self.__canvas.winfo_height() // self.__alto_fila + 2
+        primera = max(0, inicio - FILAS_MARGEN)
+        ultima = min(len(self.__posiciones), inicio + visibles + FILAS_MARGEN)
+        # Construimos los huecos que falten (sólo ocurre al principio o si
+        # aumenta la altura de la tabla).
+        while len(self.__huecos) < ultima - primera:
+            self.__huecos.append(self.__crear_hueco())
+        numero = len(self.__huecos)
+        usados = set()
+        for posicion in range(primera, ultima):
+            indice = posicion % numero
+            hueco = self.__huecos[indice]
+            usados.add(indice)
+            fila = self.__posiciones[posicion]
+            if hueco["fila"] != fila or fila in self.__modificadas:
+                self.__rellenar_hueco(hueco, fila)
+            if hueco["posicion"] != posicion:
+                hueco["posicion"] = posicion
+                hueco["marco"].place(
+                    x=0, y=posicion * self.__alto_fila,
+                    relwidth=1, height=self.__alto_fila)
+        self.__modificadas.clear()
+        # Ocultamos los huecos que no se están utilizando.
+        for indice, hueco in enumerate(self.__huecos):
+            if indice not in usados and hueco["fila"] is not None:
+                hueco["marco"].place_forget()
+                hueco["fila"] = None
+                hueco["posicion"] = None
+
+    def __crear_hueco(self):
         """
-        Asigna el color para la celda correspondiente
+        Construye un hueco vacío, con las mismas celdas que una fila de la
+        tabla (ver función añadir_fila).
 
         """
+        marco = tkinter.Frame(self.__marco_tabla, bg=self.__color_borde)
+        hueco = {"marco": marco, "fila": None, "posicion": None,
+                 "L": {}, "V": {}}
+        for columna in range(self.__columnas):
+            if self.__ancho[columna] == 0:
+                continue
+            marco.columnconfigure(columna, weight=self.__ajuste[columna])
+            marco_celda = tkinter.Frame(marco,
+                                        width=self.__ancho[columna],
+                                        height=self.__alto_datos)
+            marco_celda.grid(
+                row=0, column=columna, sticky="nsew", padx=1, pady=1)
+            marco_celda.pack_propagate(False)
+            etiqueta_celda = tkinter.Label(
+                marco_celda, fg=self.__color_fuente_filas,
+                font=self.__fuente_filas,
+                anchor=ANCHOR[self.__alineacion[columna]], padx=10)
+            etiqueta_celda.pack(fill=tkinter.BOTH, expand=True)
+            self.__registrar_celda(etiqueta_celda, hueco, columna)
+            hueco["L"][columna] = etiqueta_celda
+        return hueco
+
+    def __rellenar_hueco(self, hueco, fila):
+        """
+        Muestra los datos de la fila indicada en el hueco.
+
+        """
+        hueco["fila"] = fila
+        valores = self.__datos[fila]
+        colores = self.__colores_datos.get(fila)
+        for columna, etiqueta in hueco["L"].items():
+            self.__pintar_celda(
+                etiqueta, hueco["V"], fila, columna, valores[columna], colores)
+
+################################################################################
+################################################################################
+    # Eventos de las celdas.
+################################################################################
+################################################################################
+    def __registrar_celda(self, etiqueta, controles, columna):
+        """
+        Añade la etiqueta de una celda al sistema de eventos de la tabla.
+
+        Argumentos:
+        - etiqueta: etiqueta de la celda.
+        - controles: controles de la fila (o hueco del modo virtual) a la que
+          pertenece la etiqueta. La fila que muestran en cada momento se
+          guarda en la clave "fila".
+        - columna: columna de la celda.
+
+        """
+        etiqueta.bindtags((self.__etiqueta_eventos,) + etiqueta.bindtags())
+        self.__celdas[etiqueta] = (controles, columna)
+
+    def __delegar_evento(self, secuencia, evento):
+        """
+        Lanza las funciones asociadas al evento de una celda, con la fila que
+        muestre la celda en ese momento (que puede cambiar, ya que las
+        etiquetas se reutilizan para otras filas).
+
+        """
+        try:
+            controles, columna = self.__celdas[evento.widget]
+        except KeyError:
+            return
+        fila = controles["fila"]
+        if fila is None:
+            return
+        for nombre, funcion in self.__eventos.get(columna, []):
+            if nombre == secuencia:
+                funcion(fila, evento)
+
+################################################################################
+################################################################################
+
+    def __pintar_celda(self, etiqueta, mostrados, fila, columna, valor,
+                       colores=None):
+        """
+        Asigna el texto y el color de una celda, sólo si han cambiado.
+
+        Argumentos:
+        - etiqueta: etiqueta de la celda.
+        - mostrados: diccionario con el texto y el color que muestra cada
+          celda de la fila, que se actualiza con los nuevos valores.
+        - fila, columna: posición de la celda, para calcular su color.
+        - valor: nuevo valor de la celda.
+        - colores: lista de colores de la fila, o None (ver función
+          __color_celda).
+
+        """
+        texto = valor if valor is not None else ""
+        color = self.__color_celda(fila, columna, texto, colores)
+        texto_actual, color_actual = mostrados.get(columna, (None, None))
+        cambios = {}
+        if texto != texto_actual:
+            cambios["text"] = texto
+        if color != color_actual:
+            cambios["bg"] = color
+        if len(cambios) == 0:
+            return
+        etiqueta.config(**cambios)
+        mostrados[columna] = (texto, color)
+
+    def __color_celda(self, fila, columna, texto, colores=None):
+        """
+        Devuelve el color para la celda correspondiente
+
+        Si se ha recibido la lista de colores de la fila, y el color de la
+        columna no es None, se utiliza directamente dicho color.
+
+        """
+        if colores is not None and colores[columna] is not None:
+            return colores[columna]
         # Comprobamos si el color para esta columna ha sido asignado.
         try:
             color_defecto = self.__color_columna[columna]['C']
@@ -509,13 +974,17 @@ class Tabla(object):
         else:
             # Comprobamos si tenemos una función para calcular el color de
             # la celda
+            if funcion is None:
+                return color_defecto
             try:
-                color = funcion(fila, columna, etiqueta["text"])
+                color = funcion(fila, columna, texto)
             except ValueError:
                 color = color_defecto
+            if color is None:
+                color = color_defecto
             # TODO: fila_completa indica que hay que pintar de ese color toda la
             # fila, no solo la celda.
-        etiqueta.config(bg=color)
+        return color
 
     def __get_ancho_tabla(self):
         return self.__ancho_tabla
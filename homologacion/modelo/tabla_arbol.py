@@ -0,0 +1,298 @@
+'''
+Created on 18 oct 2026
+
+Versión de la clase Tabla (ver módulo tabla) construida sobre un único control
+ttk.Treeview, en lugar de un marco y una etiqueta por cada celda.
+
+La clase tiene las mismas funciones que la clase Tabla, por lo que se pueden
+intercambiar. Sin embargo, el control Treeview sólo permite asignar colores a
+filas completas, no a celdas. Por ello, cada fila se representa con el color
+de la primera columna que tenga un color definido (ver función
+definir_color_columna).
+'''
+
+from bisect import bisect_left
+from functools import partial
+import tkinter
+from tkinter import ttk
+
+from modelo.tabla import ANCHOR, Tabla
+
+
+class TablaArbol(object):
+
+    def __init__(self, marco, cabecera,
+                 ancho=(100,),
+                 ajuste=(0,),
+                 alineacion=("C",),
+                 alto_cabecera=20,
+                 alto_datos=20,
+                 color_borde="black",
+                 color_fondo="gray",
+                 color_cabecera="blue",
+                 color_filas="white",
+                 fuente_cabecera=("LIBERATION SANS", 20, ""),
+                 color_fuente_cabecera="black",
+                 fuente_filas=("LIBERATION SANS", 12, ""),
+                 color_fuente_filas="black"):
+        """
+        Construcción de la tabla, y configuración.
+
+        Los parámetros son los mismos que los de la clase Tabla. El color del
+        borde y la altura de la cabecera dependen del tema de ttk, por lo que
+        no se utilizan.
+
+        """
+        self.__color_filas = color_filas
+        self.__columnas = len(ancho)
+        if len(ajuste) != self.__columnas:
+            raise ValueError(
+                "Error tabla: lista de ajustes de columnas incorrecta")
+        if len(alineacion) != self.__columnas:
+            raise ValueError(
+                "Error tabla: lista de alineación de columnas incorrecta")
+
+        # Columnas que se muestran (las de ancho distinto de 0). El control
+        # Treeview identifica las columnas por su posición entre las columnas
+        # mostradas, por lo que guardamos la relación con el índice original.
+        self.__visibles = [c for c in range(self.__columnas) if ancho[c] != 0]
+        nombres = ["c%i" % c for c in self.__visibles]
+
+        # Estilo propio para esta tabla, para no modificar otros Treeview.
+        estilo = "Tabla%i.Treeview" % id(self)
+        ttk.Style().configure(
+            estilo, rowheight=alto_datos, font=fuente_filas,
+            foreground=color_fuente_filas, background=color_filas,
+            fieldbackground=color_fondo)
+        ttk.Style().configure(
+            estilo + ".Heading", font=fuente_cabecera,
+            foreground=color_fuente_cabecera, background=color_cabecera)
+
+        self.__arbol = ttk.Treeview(
+            marco, columns=nombres, show="headings", style=estilo,
+            selectmode="none")
+        self.__arbol.grid(row=0, column=0, sticky="nsew")
+        self.__barra = ttk.Scrollbar(
+            marco, orient=tkinter.VERTICAL, command=self.__arbol.yview)
+        self.__barra.grid(row=0, column=1, sticky="ns")
+        self.__arbol.config(yscrollcommand=self.__barra.set)
+        marco.rowconfigure(index=0, weight=1)
+        marco.columnconfigure(index=0, weight=1)
+
+        for columna, nombre in zip(self.__visibles, nombres):
+            self.__arbol.heading(
+                nombre, text=cabecera[columna],
+                anchor=ANCHOR[alineacion[columna]])
+            self.__arbol.column(
+                nombre, width=ancho[columna], minwidth=ancho[columna],
+                stretch=ajuste[columna] != 0,
+                anchor=ANCHOR[alineacion[columna]])
+
+        # Ancho mínimo de la tabla, igual que en la clase Tabla.
+        self.__ancho_tabla = sum(ancho) + self.__barra.winfo_reqwidth()
+
+        # Datos de las filas mostradas: lista ordenada de filas, y para cada
+        # fila, el texto de sus celdas y su color, para sólo modificar las
+        # filas que cambien.
+        self.__filas = []
+        self.__mostrados = {}
+        # Eventos de las celdas y de la cabecera, por secuencia de tkinter y
+        # columna (ver función __delegar_evento).
+        self.__eventos = {}
+        self.__eventos_cabecera = {}
+        self.__secuencias = set()
+        # Colores de las columnas (ver función definir_color_columna), y
+        # colores para los que ya se ha creado la etiqueta (tag) del Treeview.
+        self.__color_columna = {}
+        self.__colores = set()
+
+################################################################################
+################################################################################
+    def refrescar(self, datos, solo_actualizar=False, colores=None):
+        """
+        Actualizar los datos de la tabla (ver clase Tabla).
+
+        """
+        if solo_actualizar:
+            datos = {f: v for f, v in datos.items() if f in self.__mostrados}
+            borrar = ()
+        else:
+            borrar = [f for f in self.__mostrados if f not in datos]
+        self.__actualizar(datos, borrar, colores)
+
+    def actualizar_filas(self, datos, borrar=(), colores=None):
+        """
+        Actualiza sólo las filas indicadas (ver clase Tabla).
+
+        """
+        self.__actualizar(datos, borrar, colores)
+
+    def añadir_fila(self, fila, valores, colores=None):
+        if fila in self.__mostrados:
+            raise ValueError("Fila repetida")
+        self.__actualizar({fila: valores}, colores={fila: colores})
+
+    def borrar_fila(self, fila):
+        self.__actualizar({}, (fila,))
+
+    def refrescar_fila(self, fila, valores, colores=None):
+        if fila not in self.__mostrados:
+            raise ValueError("Fila a actualizar no existe.")
+        self.__actualizar({fila: valores}, colores={fila: colores})
+
+################################################################################
+################################################################################
+    def añadir_evento(self, evento, columna, funcion):
+        """
+        Añade un evento en una columna determinada para todas las filas (ver
+        clase Tabla).
+
+        """
+        self.__eventos.setdefault(evento, {}).setdefault(
+            columna, []).append(funcion)
+        self.__asociar_evento(evento)
+
+    def añadir_evento_cabecera(self, evento, columna, funcion):
+        """
+        Añade un evento sobre el campo correspondiente a la cabecera.
+
+        """
+        self.__eventos_cabecera.setdefault(evento, {}).setdefault(
+            columna, []).append(funcion)
+        self.__asociar_evento(evento)
+
+    def definir_color_columna(self, columna, color, funcion=None):
+        """
+        Definir el color para representar una celda (ver clase Tabla).
+
+        NOTA: Cada fila se representa con el color de la primera columna que
+        tenga un color definido.
+
+        """
+        self.__color_columna[columna] = {
+            'C': color,
+            'F': funcion}
+
+    @staticmethod
+    def formatear_lista_tabla(datos):
+        """
+        Ver clase Tabla.
+
+        """
+        return Tabla.formatear_lista_tabla(datos)
+
+################################################################################
+################################################################################
+    def __actualizar(self, datos, borrar=(), colores=None):
+        """
+        Añade, actualiza o elimina filas del Treeview.
+
+        """
+        if colores is None:
+            colores = {}
+        borrar = [f for f in borrar if f in self.__mostrados]
+        if len(borrar) > 0:
+            self.__arbol.delete(*(str(f) for f in borrar))
+            for f in borrar:
+                del self.__mostrados[f]
+                del self.__filas[bisect_left(self.__filas, f)]
+
+        for fila, valores in datos.items():
+            if len(valores) != self.__columnas:
+                raise ValueError(
+                    "Error al actualizar fila: número de columnas incorrecto")
+            textos = tuple(
+                valores[c] if valores[c] is not None else ""
+                for c in self.__visibles)
+            color = self.__color_fila(fila, valores, colores.get(fila))
+            anterior = self.__mostrados.get(fila)
+            if anterior is None:
+                indice = bisect_left(self.__filas, fila)
+                self.__filas.insert(indice, fila)
+                self.__arbol.insert(
+                    "", indice, iid=str(fila), values=textos, tags=(color,))
+            elif anterior != (textos, color):
+                self.__arbol.item(str(fila), values=textos, tags=(color,))
+            self.__mostrados[fila] = (textos, color)
+
+    def __color_fila(self, fila, valores, colores=None):
+        """
+        Devuelve el color de la fila, que se emplea como etiqueta (tag) del
+        Treeview.
+
+        Si se ha recibido la lista de colores de la fila (ver función
+        refrescar de la clase Tabla), se utiliza el color de la columna
+        correspondiente, en lugar de calcularlo.
+
+        """
+        color = self.__color_filas
+        for columna in sorted(self.__color_columna):
+            color_defecto = self.__color_columna[columna]['C']
+            funcion = self.__color_columna[columna]['F']
+            valor = valores[columna]
+            if colores is not None and colores[columna] is not None:
+                color = colores[columna]
+                break
+            if funcion is None:
+                color = color_defecto
+                break
+            try:
+                color = funcion(
+                    fila, columna, valor if valor is not None else "")
+            except (TypeError, ValueError):
+                color = color_defecto
+            if color is None:
+                color = color_defecto
+            break
+        if color not in self.__colores:
+            self.__colores.add(color)
+            self.__arbol.tag_configure(color, background=color)
+        return color
+
+    def __asociar_evento(self, evento):
+        """
+        Asocia la secuencia al Treeview, una única vez para todas las filas,
+        columnas y la cabecera.
+
+        """
+        if evento in self.__secuencias:
+            return
+        self.__secuencias.add(evento)
+        self.__arbol.bind(evento, partial(self.__delegar_evento, evento))
+
+    def __delegar_evento(self, secuencia, evento):
+        """
+        Lanza las funciones asociadas al evento, en función de la zona del
+        Treeview donde se ha producido (cabecera o celda).
+
+        """
+        region = self.__arbol.identify_region(evento.x, evento.y)
+        posicion = self.__arbol.identify_column(evento.x)
+        try:
+            columna = self.__visibles[int(posicion[1:]) - 1]
+        except (ValueError, IndexError):
+            return
+        if region == "heading":
+            for funcion in self.__eventos_cabecera.get(
+                    secuencia, {}).get(columna, []):
+                funcion(evento)
+        elif region == "cell":
+            fila = self.__arbol.identify_row(evento.y)
+            if fila == "":
+                return
+            for funcion in self.__eventos.get(secuencia, {}).get(columna, []):
+                funcion(int(fila), evento)
+
+################################################################################
+################################################################################
+    def __get_ancho_tabla(self):
+        return self.__ancho_tabla
+
+    def __set_desp_vertical(self, habilitar=None):
+        # El Treeview gestiona su propio desplazamiento, sólo cuando el ratón
+        # se encuentra sobre la tabla, por lo que no es necesario
+        # deshabilitarlo.
+        pass
+
+    ancho_tabla = property(__get_ancho_tabla, None, None, None)
+    desp_vertical = property(None, __set_desp_vertical, None, None)
@@ -0,0 +1,64 @@
+'''
+Created on 18 oct 2026
+
+Clase para agrupar en una única ejecución todas las peticiones de una tarea
+que se producen durante un mismo ciclo del bucle de eventos de tkinter.
+
+Por ejemplo, al redimensionar la ventana, se producen decenas de eventos
+<Configure> por segundo. Si cada evento recalcula el tamaño de la tabla, la
+interfaz se vuelve lenta. En su lugar, cada evento programa la tarea, y ésta
+se ejecuta una sola vez cuando tkinter termina de atender el resto de eventos.
+'''
+
+
+class TareaAplazada(object):
+
+    def __init__(self, widget, funcion, espera=None):
+        """
+        Argumentos:
+        - widget: cualquier widget de tkinter, necesario para programar la
+          tarea mediante la función after_idle.
+        - funcion: función (sin argumentos) que realiza la tarea.
+        - espera: si es None, la tarea se programa con after_idle. Si no, se
+          programa como un temporizador (función after) de espera
+          milisegundos. Los temporizadores, a diferencia de las tareas
+          after_idle, no se ejecutan desde update_idletasks, por lo que otra
+          tarea que llame a update_idletasks no ejecuta la tarea antes de
+          tiempo (ver función __construir_pendientes de la clase Tabla).
+
+        """
+        self.__widget = widget
+        self.__funcion = funcion
+        self.__espera = espera
+        # Identificador de la tarea programada, o None si no hay ninguna
+        # pendiente.
+        self.__pendiente = None
+
+    def programar(self, evento=None):
+        """
+        Programa la ejecución de la tarea, si no estaba ya programada.
+
+        Se puede asociar directamente a un evento de tkinter.
+
+        """
+        if self.__pendiente is not None:
+            return
+        if self.__espera is None:
+            self.__pendiente = self.__widget.after_idle(self.__ejecutar)
+        else:
+            self.__pendiente = self.__widget.after(
+                self.__espera, self.__ejecutar)
+
+    def cancelar(self):
+        """
+        Cancela la tarea, si estaba programada (por ejemplo, antes de destruir
+        los controles sobre los que trabaja).
+
+        """
+        if self.__pendiente is not None:
+            self.__widget.after_cancel(self.__pendiente)
+            self.__pendiente = None
+
+    def __ejecutar(self):
+        self.__pendiente = None
+        self.__funcion()
@@ -0,0 +1,68 @@
+-- Created on 18 oct 2026
+--
+-- Registro de cambios de los equipos (tabla Homologacion_Cambios), empleado
+-- por la aplicación para refrescar sólo los equipos modificados desde el
+-- último refresco (ver funciones marca_cambios y cambios_desde de la clase
+-- Conexion).
+--
+-- Este script se ejecuta una única vez sobre la base de datos, con un usuario
+-- con permisos para crear tablas, triggers y eventos. Si la tabla no existe,
+-- la aplicación funciona igualmente, pero refresca siempre la tabla completa.
+--
+-- El registro se rellena de dos formas:
+-- - Los triggers sobre las tablas Homologacion_EstadoEquipo,
+--   Homologacion_Equipo y Homologacion_Comentario registran los cambios de
+--   cualquier usuario o aplicación.
+-- - La aplicación añade además un registro justo antes de confirmar cada
+--   edición. Los registros de los triggers tienen la fecha en la que se
+--   modifica cada dato, y no se ven hasta que se confirma la transacción, que
+--   en la página de edición puede durar varios minutos, por lo que la
+--   consulta de cambios no los detectaría.
+--
+-- NOTA: Los cambios de otras aplicaciones realizados dentro de transacciones
+-- de más de unos segundos (ver SOLAPE_CAMBIOS en modelo/base_datos.py) no se
+-- detectan hasta el siguiente refresco completo de la tabla.
+--
+-- Los registros de más de un día se eliminan cada hora mediante un evento,
+-- por lo que es necesario que el planificador de eventos esté activo
+-- (event_scheduler = ON).
+
+CREATE TABLE IF NOT EXISTS Homologacion_Cambios (
+    ID_CAMBIO BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    FK_EQUIPO INT NOT NULL,
+    fecha TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX (fecha));
+
+CREATE OR REPLACE TRIGGER Homologacion_Cambios_EstadoEquipo_ins
+    AFTER INSERT ON Homologacion_EstadoEquipo FOR EACH ROW
+    INSERT INTO Homologacion_Cambios(FK_EQUIPO) VALUES (NEW.FK_EQUIPO);
+CREATE OR REPLACE TRIGGER Homologacion_Cambios_EstadoEquipo_upd
+    AFTER UPDATE ON Homologacion_EstadoEquipo FOR EACH ROW
+    INSERT INTO Homologacion_Cambios(FK_EQUIPO) VALUES (NEW.FK_EQUIPO);
+CREATE OR REPLACE TRIGGER Homologacion_Cambios_EstadoEquipo_del
+    AFTER DELETE ON Homologacion_EstadoEquipo FOR EACH ROW
+    INSERT INTO Homologacion_Cambios(FK_EQUIPO) VALUES (OLD.FK_EQUIPO);
+
+CREATE OR REPLACE TRIGGER Homologacion_Cambios_Equipo_ins
+    AFTER INSERT ON Homologacion_Equipo FOR EACH ROW
+    INSERT INTO Homologacion_Cambios(FK_EQUIPO) VALUES (NEW.FK_EQUIPO);
+CREATE OR REPLACE TRIGGER Homologacion_Cambios_Equipo_upd
+    AFTER UPDATE ON Homologacion_Equipo FOR EACH ROW
+    INSERT INTO Homologacion_Cambios(FK_EQUIPO) VALUES (NEW.FK_EQUIPO);
+CREATE OR REPLACE TRIGGER Homologacion_Cambios_Equipo_del
+    AFTER DELETE ON Homologacion_Equipo FOR EACH ROW
+    INSERT INTO Homologacion_Cambios(FK_EQUIPO) VALUES (OLD.FK_EQUIPO);
+
+CREATE OR REPLACE TRIGGER Homologacion_Cambios_Comentario_ins
+    AFTER INSERT ON Homologacion_Comentario FOR EACH ROW
+    INSERT INTO Homologacion_Cambios(FK_EQUIPO) VALUES (NEW.FK_EQUIPO);
+CREATE OR REPLACE TRIGGER Homologacion_Cambios_Comentario_upd
+    AFTER UPDATE ON Homologacion_Comentario FOR EACH ROW
+    INSERT INTO Homologacion_Cambios(FK_EQUIPO) VALUES (NEW.FK_EQUIPO);
+CREATE OR REPLACE TRIGGER Homologacion_Cambios_Comentario_del
+    AFTER DELETE ON Homologacion_Comentario FOR EACH ROW
+    INSERT INTO Homologacion_Cambios(FK_EQUIPO) VALUES (OLD.FK_EQUIPO);
+
+CREATE OR REPLACE EVENT Homologacion_LimpiarCambios
+    ON SCHEDULE EVERY 1 HOUR
+    DO DELETE FROM Homologacion_Cambios WHERE fecha < NOW() - INTERVAL 1 DAY;
@@ -26,10 +26,12 @@ import tkinter.messagebox
 
 from leer_constantes import leer_cabecera, leer_alturas_tabla, leer_logos
 from leer_constantes import leer_colores_tabla, leer_colores_puntos
-from leer_constantes import leer_fuente
+from leer_constantes import leer_fuente, leer_modo_tabla
+from modelo.almacen_equipos import AlmacenEquipos
 from modelo.base_datos import estado, orden_tabla
 from modelo.pagina_edicion import Pagina
 from modelo.tabla import Tabla
+from modelo.tabla_arbol import TablaArbol
 from vista.formulario_seleccion import abrir_seleccion
 
 
@@ -118,9 +120,38 @@ class TablaEquipos(object):
         cabecera = leer_cabecera()
         columnas = self.__conexion.columnas()
         configuracion = self.__configuracion_columnas(columnas, cabecera)
+        # Posición de los campos que determinan el estado de cada equipo
+        # dentro de los registros de la lista de equipos.
+        campos = [campo["Field"] for campo in columnas]
+        self.__columna_dorsal = campos.index("FK_EQUIPO")
+        self.__columna_registrado = campos.index("registrado")
+        self.__columna_homologado = campos.index("homologado")
+        # Almacén en memoria con todos los equipos. El filtro de estado, el
+        # orden y las categorías se aplican sobre este almacén, sin necesidad
+        # de consultar la base de datos.
+        self.__equipos = AlmacenEquipos(campos)
+        # Datos mostrados actualmente en la tabla, para sólo enviar a la
+        # tabla las filas que cambien.
+        self.__datos_tabla = {}
+        # Colores de las celdas de cada equipo, indexados por dorsal. Se
+        # calculan una única vez al recibir los datos de la base de datos (ver
+        # función __calcular_colores), y se envían a la tabla junto con los
+        # valores.
+        self.__colores_equipos = {}
+        # Columnas cuyo color depende del estado del equipo, y columnas cuyo
+        # color depende del valor de la zona de homologación.
+        self.__columnas_equipo = []
+        self.__columnas_zona = []
         alturas = leer_alturas_tabla()
+        # Elegimos el tipo de tabla en función del archivo de configuración.
+        modo_tabla = leer_modo_tabla()
+        if modo_tabla == "arbol":
+            clase_tabla, opciones_tabla = TablaArbol, {}
+        else:
+            clase_tabla = Tabla
+            opciones_tabla = {"virtual": modo_tabla == "virtual"}
         # Creamos la tabla, junto con su formato.
-        self.__tabla_equipos = Tabla(
+        self.__tabla_equipos = clase_tabla(
             tabla,
             cabecera=configuracion["nombre"],
             ancho=configuracion["ancho"],
@@ -135,7 +166,8 @@ class TablaEquipos(object):
             fuente_cabecera=fuente_cabecera,
             color_fuente_cabecera=color_fuente_cabecera,
             fuente_filas=self.__fuente_filas,
-            color_fuente_filas=self.__color_fuente_filas)
+            color_fuente_filas=self.__color_fuente_filas,
+            **opciones_tabla)
 
         # Añadimos el evento doble click a la cabecera, para permitir ordenar
         # respecto de la columna pulsada.
@@ -146,15 +178,6 @@ class TablaEquipos(object):
         self.__tabla_equipos.añadir_evento_cabecera(
             "<Double-1>", 3, partial(self.__filtro_categorias, None))
 
-        def color_zona(fila, columna, valor):
-            " Función para definir el color de las zonas de hommologación."
-            try:
-                color = self.__colores["COLOR_SI"] if int(
-                    valor) == 0 else self.__colores["COLOR_NO"]
-            except ValueError:
-                color = self.__colores["COLOR_NP"]
-            return color
-
         # Configuración de eventos. La tabla de configuración de la base de
         # datos nos indica sobre qué columnas se deben ejecutar los eventos
         # de edición de puntos, y sobre que columnas los de cambio de registro.
@@ -165,34 +188,35 @@ class TablaEquipos(object):
                 # El código 0 se refiere a cambio de registro.
                 self.__tabla_equipos.añadir_evento(
                     "<Double-1>", columna, self.registrar)
-                # Asignamos la funcion que determina el color de la celda
-                # del nombre del equipo.
-                self.__tabla_equipos.definir_color_columna(
-                    columna, "white", self.__color_equipo)
+                # El color de la celda del nombre del equipo depende de su
+                # estado (ver función __calcular_colores).
+                self.__columnas_equipo.append(columna)
+                self.__tabla_equipos.definir_color_columna(columna, "white")
             else:
                 # El resto de códigos se refieren al número de zona que debe
                 # editar dicho evento.
                 self.__tabla_equipos.añadir_evento(
                     "<Double-1>", columna,
                     self.__editar_zona(evento)(self.__editar_zona_aux))
-                # Asignamos también las funciones para calcular el color de
-                # la celda en función del valor de ésta.
-                self.__tabla_equipos.definir_color_columna(
-                    columna, "white", color_zona)
+                # El color de la celda depende del valor de ésta (ver
+                # función __calcular_colores).
+                self.__columnas_zona.append(columna)
+                self.__tabla_equipos.definir_color_columna(columna, "white")
 
         self.__colores = leer_colores_puntos()
         # Inicialmente arrancamos la aplicación mostrando todos los equipos.
-        # La llamada a esta función rellena por primera vez la tabla con datos.
-        self.__estado_tabla = self.__seleccionar_estado(estado.TODOS)
+        # La llamada a refrescar_tabla rellena por primera vez la tabla con
+        # datos.
+        self.__estado_tabla = estado.TODOS
+        self.refrescar_tabla()
 
         # Guardamos en esta variable la referencia a la página que estamos
         # editando. Si es None, significa que no estamos editando nada, es
         # decir, estamos en modo Lectura.
         self.__pagina_edicion = None
-        # Variable temporal empleada por la función que determinar el color
-        # de la columna con el nombre del equipo (ver función refrescar_tabla
-        # y __color_equipo).
-        self.__temp_estado = None
+        # Páginas de edición ya construidas, indexadas por zona. Cada página
+        # se reutiliza para todos los equipos de su zona (ver clase Pagina).
+        self.__paginas = {}
         # Guardamos el fondo que debemos mostrar cuando no hay ningún equipo
         # editando.
         self.__mostrar_area()
@@ -209,7 +233,7 @@ class TablaEquipos(object):
                 "antes de editar otro equipo.")
             return
         # Obtenemos el nombre del equipo para mostrarselo al usuario.
-        dorsal, equipo = self.__conexion.datos_equipo(fila, self.__orden)
+        dorsal, equipo, __, __ = self.__equipos.equipo(fila)
         # Antes de cambiar de estado, preguntamos al usuario.
         if tkinter.messagebox.askokcancel(
                 "Registrar equipo",
@@ -250,8 +274,8 @@ class TablaEquipos(object):
         # Si el equipo no está registrado, no podemos homologarlo todavía.
         # En primer lugar, obtenemos el dorsal del equipo a partir de la fila en
         # la que se encuentra.
-        dorsal, __ = self.__conexion.datos_equipo(fila, self.__orden)
-        if self.__conexion.estado_equipo(dorsal) == 0:
+        dorsal, nombre, registrado, __ = self.__equipos.equipo(fila)
+        if registrado == 0:
             return
         # Función para definir el color de la etiqueta de la página.
 
@@ -259,13 +283,19 @@ class TablaEquipos(object):
             if not seccion:
                 return self.__colores["COLOR_SC"]
             return self.__colores["COLOR_SI"] if valor == 0 else self.__colores["COLOR_NO"]
-        # Creamos una nueva página para editar los puntos de la zona.
+        # Abrimos la página de la zona para editar los puntos del equipo. Si
+        # es la primera vez que se edita la zona, construimos la página.
         try:
-            # Fijamos el mismo color del borde de la tabla en la página.
-            colores_tabla = leer_colores_tabla()
-            self.__pagina_edicion = Pagina(
-                self.__puntos, self.__conexion, fila, self.__orden, zona,
-                self.__desbloquear, color_punto, colores_tabla["BORDE"])
+            pagina = self.__paginas.get(zona)
+            if pagina is None:
+                # Fijamos el mismo color del borde de la tabla en la página.
+                colores_tabla = leer_colores_tabla()
+                pagina = Pagina(
+                    self.__puntos, self.__conexion, zona,
+                    self.__desbloquear, color_punto, colores_tabla["BORDE"])
+                self.__paginas[zona] = pagina
+            pagina.abrir(dorsal, nombre)
+            self.__pagina_edicion = pagina
             self.__mostrar_area()
 
         except BlockingIOError as e:
@@ -289,61 +319,103 @@ class TablaEquipos(object):
         refresca el equipo indicado.
 
         """
-        # Obtenemos los datos para la tabla,
-        lista = self.__conexion.lista_equipos(
-            self.__estado_tabla, self.__orden, dorsal)
-        # NOTA: Si dorsal no es None, es decir, requerimos la información de
-        # un equipo, pero la base de datos no nos devuelve ningún registro,
-        # significa que éste ha cambiado de estado y no supera el filtro de la
-        # tabla actual. En ese caso, lo que hacemos es refrescar toda la tabla,
-        # y ponemos dorsal a None para que entre en el código correcto del if.
-        if len(lista) == 0:
-            lista = self.__conexion.lista_equipos(
-                self.__estado_tabla, self.__orden)
-            dorsal = None
-        # Formateamos los datos para mostrarlos en la tabla.
-        lista = Tabla.formatear_lista_tabla(lista)
-        # Obtenemos el estado de cada equipo, para que la función de determinar
-        # el color de la celda funcione correctamente.
-        lista_estados = self.__conexion.lista_estado_equipos(
-            self.__orden, dorsal)
-        # Para ello generamos una variable temporal que será accedida por la
-        # función de cálculo del color de la celda con el nombre del equipo.
-        self.__temp_estado = {}
-        for estado in lista_estados:
-            self.__temp_estado[estado["ORDEN"]] = estado
-        # Determinamos si es necesario refrescar toda la tabla, o sólo la
-        # información del equipo actual.
+        lista = self.__conexion.lista_equipos(dorsal)
         if dorsal is None:
-            # Si hay que refrescar toda la tabla, hacemos la llamada normal.
-            self.__tabla_equipos.refrescar(lista)
+            self.__equipos.cargar(lista)
+        else:
+            self.__equipos.actualizar(lista)
+        self.__calcular_colores(lista, dorsal is None)
+        self.__mostrar_datos()
+
+    def refrescar_tabla_datos(self, resultado):
+        """
+        Refresca la tabla con los datos obtenidos por el hilo de refresco (ver
+        módulo refresco).
+
+        """
+        if resultado["completo"]:
+            self.__equipos.cargar(resultado["lista"])
         else:
-            # y si sólo es refrescar los datos del equipo en cuestión, ponemos
-            # el indicador a True.
-            self.__tabla_equipos.refrescar(lista, True)
-        # En este punto ya no es necesario la variable temporal, por lo que
-        # podemos eliminarla.
-        self.__temp_estado = None
+            self.__equipos.actualizar(resultado["lista"])
+        self.__calcular_colores(resultado["lista"], resultado["completo"])
+        self.__mostrar_datos()
+
+    def __calcular_colores(self, lista, completo):
+        """
+        Calcula el color de las celdas de los equipos recibidos de la base de
+        datos, en una única pasada sobre la lista de registros.
+
+        Argumentos:
+        - lista: registros de los equipos, con el formato de la vista
+          Homologacion_ListaEquipos.
+        - completo: si es True, la lista contiene todos los equipos, por lo que
+          se descartan los colores calculados anteriormente.
+
+        """
+        if completo:
+            self.__colores_equipos = {}
+        color_si = self.__colores["COLOR_SI"]
+        color_no = self.__colores["COLOR_NO"]
+        color_np = self.__colores["COLOR_NP"]
+        for registro in lista:
+            colores = [None] * len(registro)
+            # Color del equipo, en función de su estado.
+            if not registro[self.__columna_registrado]:
+                color = color_np
+            elif not registro[self.__columna_homologado]:
+                color = color_no
+            else:
+                color = color_si
+            for columna in self.__columnas_equipo:
+                colores[columna] = color
+            # Color de las zonas, en función de su valor.
+            for columna in self.__columnas_zona:
+                try:
+                    colores[columna] = color_si if int(
+                        registro[columna]) == 0 else color_no
+                except (TypeError, ValueError):
+                    colores[columna] = color_np
+            self.__colores_equipos[registro[self.__columna_dorsal]] = colores
+
+    def __mostrar_datos(self):
+        """
+        Muestra en la tabla los datos del almacén de equipos, en función del
+        filtro de estado, el orden y las categorías seleccionadas.
+
+        Sólo se envían a la tabla las filas que han cambiado respecto de los
+        datos mostrados actualmente, y las filas que hay que eliminar.
+
+        """
+        datos = self.__equipos.tabla(
+            self.__estado_tabla, self.__orden, self.__conexion.categorias)
+        cambios = {fila: valores for fila, valores in datos.items()
+                   if self.__datos_tabla.get(fila) != valores}
+        borrar = [fila for fila in self.__datos_tabla if fila not in datos]
+        # Los colores dependen únicamente de los valores de la fila, por lo
+        # que sólo cambian en las filas que han cambiado.
+        colores = {
+            fila: self.__colores_equipos.get(valores[self.__columna_dorsal])
+            for fila, valores in cambios.items()}
+        self.__datos_tabla = datos
+        self.__tabla_equipos.actualizar_filas(cambios, borrar, colores)
 
     def __seleccionar_estado(self, es):
         """
         Permite cambiar el estado (filtro) de la tabla de equipos.
 
         """
-        global estado_tabla
         self.__estado_tabla = es
-        self.refrescar_tabla()
-        return self.__estado_tabla
+        self.__mostrar_datos()
 
-    def __desbloquear(self, mensaje):
+    def __desbloquear(self):
         """
         Evento que debe ser llamado una vez se cierre la página de edición.
 
         """
-        if not tkinter.messagebox.askokcancel("Finalizar edición equipo", mensaje):
-            return False
         # Cada vez que cerramos una página, refrescamos la tabla, ya que es
-        # posible que el equipo haya cambiado de estado.
+        # posible que el equipo haya cambiado de estado. La página nos llama
+        # una vez confirmados los datos, por lo que la consulta, realizada
+        # desde la reserva de lectura, ya obtiene los nuevos datos.
         self.refrescar_tabla(self.__pagina_edicion.equipo)
         # Y ponemos su estado en modo lectura, hasta que abramos una nueva
         # página.
@@ -352,7 +424,6 @@ class TablaEquipos(object):
         # Habilitamos las funciones de desplazamiento vertical de la tabla.
         self.__tabla_equipos.desp_vertical = True
         self.__bloquear_pestañas(False)
-        return True
 
     def __bloquear_pestañas(self, bloquear=True):
         estado = tkinter.DISABLED if bloquear else tkinter.NORMAL
@@ -369,7 +440,7 @@ class TablaEquipos(object):
         # Solo actualizamos el criterio de ordenación cuando no estamos
         # editando ningún equipo.
         self.__orden = crierio
-        self.refrescar_tabla()
+        self.__mostrar_datos()
 
     def __filtro_categorias(self, categorias, event=None):
         """
@@ -389,27 +460,7 @@ class TablaEquipos(object):
 
         if aceptar:
             self.__conexion.seleccion_categorias(categorias)
-            self.refrescar_tabla()
-
-    def __color_equipo(self, fila, columna, valor):
-        """
-        Obtener el color de la etiqueta correspondiente a la columna con el
-        nombre del equipo.
-
-        """
-        # La función necesita la variable __temp_estado, por lo que es
-        # necesario asegurarse que esta variable existe antes de poder
-        # utilizarla.
-        try:
-            datos_equipo = self.__temp_estado[fila]
-        except KeyError:
-            return
-        if not datos_equipo["registrado"]:
-            return self.__colores["COLOR_NP"]
-        elif not datos_equipo["homologado"]:
-            return self.__colores["COLOR_NO"]
-        else:
-            return self.__colores["COLOR_SI"]
+            self.__mostrar_datos()
 
     @staticmethod
     def __configuracion_columnas(columnas, configuracion):
@@ -480,8 +531,12 @@ class TablaEquipos(object):
     def get_ancho(self):
         return self.__tabla_equipos.ancho_tabla
 
+    def get_resumen(self):
+        return self.__equipos.resumen()
+
     def get_edicion(self):
         return self.__pagina_edicion is not None
 
     ancho = property(get_ancho, None, None, None)
     edicion = property(get_edicion, None, None, None)
+    resumen = property(get_resumen, None, None, None)